@@ -2,15 +2,14 @@
 Card processing logic for MtgPng2Pdf.
 """
 
-import os
 import random
 import re
-import urllib.parse
+import sys
 from collections import defaultdict
 from typing import List, Dict, Optional, Tuple, Set, Union
 
 from image_handler import ImageSource
-from parsing_utils import parse_moxfield_line, normalize_card_name, parse_variant_filename
+from parsing_utils import parse_moxfield_line, normalize_card_name
 from config import BASIC_LAND_NAMES
 from token_set_manager import is_token_set
 
@@ -19,6 +18,18 @@ SIDEBOARD_HEADING_RE = re.compile(r"^[\s#]*sideboard[\s#]*$", re.IGNORECASE)
 # Regex to detect "Token" heading (case-insensitive, optional leading spaces/hash)
 TOKEN_HEADING_RE = re.compile(r"^[\s#]*token[\s#]*$", re.IGNORECASE)
 
+def parse_set_filters(sets_filter: List[str]) -> List[Tuple[str, Optional[str]]]:
+    """Splits 'set' / 'set-variant' filter strings into (set, variant) pairs once, rather than on every comparison."""
+    return [(filter_set, filter_variant if sep else None) for filter_set, sep, filter_variant in (filter_set_str.partition('-') for filter_set_str in sets_filter)]
+
+def find_set_filter_match(source: ImageSource, set_filters: List[Tuple[str, Optional[str]]]) -> Optional[int]:
+    """Returns the index of the first (set, variant) filter the source matches, or None."""
+    _, src_set_code, src_collector_number = source.variant
+    for i, (filter_set, filter_variant) in enumerate(set_filters):
+        if src_set_code == filter_set and (filter_variant is None or (src_collector_number and src_collector_number.endswith(filter_variant))):
+            return i
+    return None
+
 def select_cards_with_priority_and_cycling(
     preferred_pool: List[ImageSource],
     general_pool: List[ImageSource],
@@ -35,25 +46,19 @@ def select_cards_with_priority_and_cycling(
 
     selected: List[ImageSource] = []
     
-    # Shuffle pools to ensure random selection within priority tiers
-    shuffled_preferred = preferred_pool[:]
+    # Randomize within priority tiers. Only the first num_to_select unique sources can be picked, so
+    # random.sample draws just those instead of shuffling a copy of the whole (possibly huge) pool;
+    # when the pools are too small and selection cycles, it returns a full random permutation.
     if spell_sets_filter:
+        set_filters = parse_set_filters(spell_sets_filter)
         def get_sort_key(source: ImageSource):
-            _, src_set_code, src_collector_number = parse_variant_filename(source.original)
-            for i, filter_set_str in enumerate(spell_sets_filter):
-                if '-' in filter_set_str:
-                    filter_set, filter_variant = filter_set_str.split('-', 1)
-                    if src_set_code == filter_set and src_collector_number and src_collector_number.endswith(filter_variant):
-                        return i
-                elif src_set_code == filter_set_str:
-                    return i
-            return len(spell_sets_filter) # Should not happen if preferred_pool is built correctly
-        shuffled_preferred.sort(key=get_sort_key)
+            match_index = find_set_filter_match(source, set_filters)
+            return match_index if match_index is not None else len(set_filters) # Should not happen if preferred_pool is built correctly
+        shuffled_preferred = sorted(preferred_pool, key=get_sort_key)
     else:
-        random.shuffle(shuffled_preferred)
+        shuffled_preferred = random.sample(preferred_pool, min(num_to_select, len(preferred_pool)))
     
-    shuffled_general = general_pool[:]
-    random.shuffle(shuffled_general)
+    shuffled_general = random.sample(general_pool, min(max(num_to_select - len(shuffled_preferred), 0), len(general_pool)))
     
     # The master list of unique sources, in order of priority
     master_selection_order = shuffled_preferred + shuffled_general
@@ -62,11 +67,11 @@ def select_cards_with_priority_and_cycling(
         return []
 
     if debug:
-        print(f"DEBUG: Master selection order for this card has {len(master_selection_order)} unique versions.")
-        if shuffled_preferred:
-            print(f"DEBUG:   - Preferred pool size: {len(shuffled_preferred)}")
-        if shuffled_general:
-            print(f"DEBUG:   - General pool size: {len(shuffled_general)}")
+        print(f"DEBUG: Master selection order for this card has {len(preferred_pool) + len(general_pool)} unique versions.")
+        if preferred_pool:
+            print(f"DEBUG:   - Preferred pool size: {len(preferred_pool)}")
+        if general_pool:
+            print(f"DEBUG:   - General pool size: {len(general_pool)}")
 
     pool_size = len(master_selection_order)
     for i in range(num_to_select):
@@ -96,6 +101,8 @@ def process_deck_list(
     """
     images_to_print: List[ImageSource] = []
     missing_card_names: List[str] = []
+    # Warnings and NOT FOUND messages are collected and written in one go at the end
+    report_lines: List[str] = []
     skipped_basic_lands_count: Dict[str, int] = defaultdict(int)
     selection_manifest: Dict[str, Dict[str, Dict[str, int]]] = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
 
@@ -143,13 +150,23 @@ def process_deck_list(
 
                 entry = parse_moxfield_line(line)
                 if not entry:
-                    print(f"  Warning: Skipping malformed data line {line_num}: '{line}'")
+                    report_lines.append(f"  Warning: Skipping malformed data line {line_num}: '{line}'")
                     missing_card_names.append(line)
                     continue
 
+                # Generic basic land requests that are going to be skipped don't need normalizing;
+                # basic land names are already in their normalized form once lowercased.
+                if skip_basic_land and not entry.set_code:
+                    lowered_name = entry.card_name.lower()
+                    if lowered_name in BASIC_LAND_NAMES:
+                        original_name = original_card_names.setdefault(lowered_name, entry.card_name)
+                        if debug: print(f"DEBUG: Skipping basic land: {entry.count}x '{original_name}'")
+                        skipped_basic_lands_count[original_name] += entry.count
+                        continue
+
                 normalized_name = normalize_card_name(entry.card_name)
-                if normalized_name not in original_card_names:
-                    original_card_names[normalized_name] = entry.card_name
+                # Keep the first spelling seen for each card (single dict lookup)
+                original_card_names.setdefault(normalized_name, entry.card_name)
 
                 # Direct cards to the appropriate section's request dictionaries
                 if current_section == "Deck":
@@ -189,8 +206,7 @@ def process_deck_list(
     # --- Helper to update manifest ---
     def update_manifest(section: str, original_name: str, sources: List[ImageSource]):
         for source in sources:
-            filename = os.path.basename(urllib.parse.unquote(source.original))
-            selection_manifest[section][original_name][filename] += 1
+            selection_manifest[section][original_name][source.filename] += 1
 
     # --- Process requests for Deck, Sideboard, and Token sections ---
     sections_to_process = {
@@ -211,6 +227,9 @@ def process_deck_list(
         }
     }
 
+    # The --spell-set force check is run-constant; only consult the basic-land set when it applies
+    forced_spell_sets = spell_sets_filter if spell_set_mode == 'force' else None
+
     for section_name, requests_dict in sections_to_process.items():
         if debug: print(f"DEBUG: Processing {section_name} requests...")
 
@@ -220,15 +239,14 @@ def process_deck_list(
             original_name = original_card_names.get(normalized_name, normalized_name)
             log_line = f"{count}x '{original_name} ({set_code.upper()}) {collector_number}'"
 
-            is_basic_land = normalized_name in BASIC_LAND_NAMES
-            if not is_basic_land and spell_set_mode == 'force' and spell_sets_filter and set_code not in spell_sets_filter:
-                print(f"  NOT FOUND (Set Mismatch): {log_line}")
+            if forced_spell_sets and set_code not in forced_spell_sets and normalized_name not in BASIC_LAND_NAMES:
+                report_lines.append(f"  NOT FOUND (Set Mismatch): {log_line}")
                 missing_card_names.append(f"{count}x {original_name} ({set_code.upper()}) {collector_number}")
                 continue
             
             found_source: Optional[ImageSource] = None
             for source in all_cards_map.get(normalized_name, []):
-                _, f_set, f_num = parse_variant_filename(source.original)
+                _, f_set, f_num = source.variant
                 if f_set == set_code and f_num == collector_number:
                     found_source = source
                     break
@@ -240,7 +258,7 @@ def process_deck_list(
                 update_manifest(section_name, original_name, selected_sources)
                 for src in selected_sources: used_sources.add(src)
             else:
-                print(f"  NOT FOUND (Fully-Specific): {log_line}")
+                report_lines.append(f"  NOT FOUND (Fully-Specific): {log_line}")
                 missing_card_names.append(f"{count}x {original_name} ({set_code.upper()}) {collector_number}")
 
         # --- Pass 3: Process SET-SPECIFIC requests ---
@@ -249,17 +267,16 @@ def process_deck_list(
             original_name = original_card_names.get(normalized_name, normalized_name)
             log_line_base = f"{count}x '{original_name} ({set_code.upper()})'"
 
-            is_basic_land = normalized_name in BASIC_LAND_NAMES
-            if not is_basic_land and spell_set_mode == 'force' and spell_sets_filter and set_code not in spell_sets_filter:
-                print(f"  NOT FOUND (Set Mismatch): {log_line_base}")
+            if forced_spell_sets and set_code not in forced_spell_sets and normalized_name not in BASIC_LAND_NAMES:
+                report_lines.append(f"  NOT FOUND (Set Mismatch): {log_line_base}")
                 missing_card_names.append(f"{count}x {original_name} ({set_code.upper()})")
                 continue
 
             available_sources = all_cards_map.get(normalized_name, [])
-            candidate_pool = [src for src in available_sources if src not in used_sources and parse_variant_filename(src.original)[1] == set_code]
+            candidate_pool = [src for src in available_sources if src not in used_sources and src.variant[1] == set_code]
             
             if not candidate_pool:
-                print(f"  NOT FOUND (Set-Specific): No available images for {log_line_base}")
+                report_lines.append(f"  NOT FOUND (Set-Specific): No available images for {log_line_base}")
                 missing_card_names.append(f"{count}x {original_name} ({set_code.upper()})")
                 continue
                 
@@ -296,7 +313,7 @@ def process_deck_list(
                 original_size = len(candidate_pool)
                 candidate_pool = [
                     src for src in candidate_pool 
-                    if parse_variant_filename(src.original)[1] not in current_sets_exclude
+                    if src.variant[1] not in current_sets_exclude
                 ]
                 if debug and len(candidate_pool) < original_size:
                     print(f"DEBUG: Excluded {original_size - len(candidate_pool)} versions of '{original_name}' due to set exclusion.")
@@ -307,7 +324,7 @@ def process_deck_list(
                 original_size = len(candidate_pool)
                 candidate_pool = [
                     src for src in candidate_pool
-                    if not is_token_set(parse_variant_filename(src.original)[1], token_sets)
+                    if not is_token_set(src.variant[1], token_sets)
                 ]
                 if debug and len(candidate_pool) < original_size:
                     print(f"DEBUG: Excluded {original_size - len(candidate_pool)} token set versions of '{original_name}' from Deck section.")
@@ -316,13 +333,13 @@ def process_deck_list(
                 original_size = len(candidate_pool)
                 candidate_pool = [
                     src for src in candidate_pool
-                    if is_token_set(parse_variant_filename(src.original)[1], token_sets)
+                    if is_token_set(src.variant[1], token_sets)
                 ]
                 if debug and len(candidate_pool) < original_size:
                     print(f"DEBUG: Filtered to {len(candidate_pool)} token set versions of '{original_name}' for Token section.")
             
             if not candidate_pool:
-                print(f"  NOT FOUND (Generic): No available images for {count}x '{original_name}' after applying filters.")
+                report_lines.append(f"  NOT FOUND (Generic): No available images for {count}x '{original_name}' after applying filters.")
                 missing_card_names.append(f"{count}x {original_name}")
                 continue
             
@@ -341,20 +358,9 @@ def process_deck_list(
             general_pool: List[ImageSource] = []
 
             if current_sets_filter:
+                set_filters = parse_set_filters(current_sets_filter)
                 for src in candidate_pool:
-                    _, src_set_code, src_collector_number = parse_variant_filename(src.original)
-                    matched = False
-                    for filter_set_str in current_sets_filter:
-                        if '-' in filter_set_str:
-                            filter_set, filter_variant = filter_set_str.split('-', 1)
-                            if src_set_code == filter_set and src_collector_number and src_collector_number.endswith(filter_variant):
-                                matched = True
-                                break
-                        elif src_set_code == filter_set_str:
-                            matched = True
-                            break
-                    
-                    if matched:
+                    if find_set_filter_match(src, set_filters) is not None:
                         preferred_pool.append(src)
                     elif src not in used_sources:
                         general_pool.append(src)
@@ -371,7 +377,7 @@ def process_deck_list(
                     selected_sources = select_cards_with_priority_and_cycling(preferred_pool, general_pool, count, debug, current_sets_filter)
                 elif current_set_mode == 'force':
                     if not preferred_pool:
-                        print(f"  NOT FOUND (Spell): No '{original_name}' matching required sets: {current_sets_filter}")
+                        report_lines.append(f"  NOT FOUND (Spell): No '{original_name}' matching required sets: {current_sets_filter}")
                         missing_card_names.append(f"{count}x {original_name} (Set Mismatch: {current_sets_filter})")
                         continue
                     selected_sources = select_cards_with_priority_and_cycling(preferred_pool, [], count, debug, current_sets_filter)
@@ -382,6 +388,9 @@ def process_deck_list(
             update_manifest(section_name, original_name, selected_sources)
             for src in selected_sources: used_sources.add(src)
 
+    if report_lines:
+        sys.stdout.write("\n".join(report_lines) + "\n")
+
     if skipped_basic_lands_count:
         print("  Skipped the following basic lands:")
         for name, num in skipped_basic_lands_count.items():
@@ -392,7 +401,7 @@ def process_deck_list(
         for name, num in skipped_tokens_count.items():
             print(f"    - {num}x {name}")
             
-    return images_to_print, list(set(missing_card_names)), selection_manifest
+    return images_to_print, list(dict.fromkeys(missing_card_names)), selection_manifest
 
 def process_extra_card(
     extra_card_str: str,
@@ -427,20 +436,9 @@ def process_extra_card(
     general_pool: List[ImageSource] = []
 
     if sets:
+        set_filters = parse_set_filters(sets)
         for src in candidate_pool:
-            _, src_set_code, src_collector_number = parse_variant_filename(src.original)
-            matched = False
-            for filter_set_str in sets:
-                if '-' in filter_set_str:
-                    filter_set, filter_variant = filter_set_str.split('-', 1)
-                    if src_set_code == filter_set and src_collector_number and src_collector_number.endswith(filter_variant):
-                        matched = True
-                        break
-                elif src_set_code == filter_set_str:
-                    matched = True
-                    break
-            
-            if matched:
+            if find_set_filter_match(src, set_filters) is not None:
                 preferred_pool.append(src)
             else:
                 general_pool.append(src)
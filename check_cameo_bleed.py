@@ -0,0 +1,59 @@
+"""
+Checks that Cameo cards are printed with the same bleed as the original one-resize-per-bleed-pixel drawing.
+Draws synthetic cards (square and rounded transparent corners) and an alignment pattern at each supported DPI
+with both, and compares the pages pixel for pixel. Run it after changing draw_card_with_border_cameo:
+    python3 check_cameo_bleed.py
+"""
+
+import math
+import sys
+
+from PIL import Image, ImageChops, ImageDraw
+
+from pdf_generator import draw_card_with_border_cameo, generate_alignment_pattern
+
+# Layout units per page pixel at each --dpi; the Cameo layouts are in 300 DPI units with a 12px bleed
+DPI_CHOICES = [72, 96, 150, 300, 600]
+CARD_SIZE_300_DPI = (745, 1040); LAYOUT_BLEED = 12; MARGIN = 40
+# Resizing only part of a card computes its filter weights with slightly different floating point rounding,
+# which moves a few semi-transparent pixels by one level
+TOLERANCE = 1
+
+def draw_card_with_border_reference(card_image: Image.Image, base_image: Image.Image, box: tuple[int, int, int, int], print_bleed: int, cell_bg_color_pil):
+    """The original drawing: one copy of the card per bleed pixel, each 2px larger, pasted outermost first."""
+    origin_x, origin_y, origin_width, origin_height = box
+    if cell_bg_color_pil is not None:
+        max_offset = max(print_bleed - 1, 0)
+        ImageDraw.Draw(base_image).rectangle([origin_x - max_offset, origin_y - max_offset, origin_x + origin_width + max_offset, origin_y + origin_height + max_offset], fill=cell_bg_color_pil)
+    for i in reversed(range(print_bleed)):
+        layer = card_image.resize((origin_width + (2 * i), origin_height + (2 * i)), Image.BICUBIC)
+        base_image.paste(layer, (origin_x - i, origin_y - i), layer if layer.mode == 'RGBA' else None)
+
+def make_test_card(size: tuple[int, int], rounded: bool) -> Image.Image:
+    """A gradient card with a thin light edge inside a dark frame, so a bleed sampled from inside the card shows."""
+    width, height = size
+    card = Image.merge('RGB', (Image.linear_gradient('L').resize(size), Image.linear_gradient('L').rotate(90).resize(size), Image.effect_noise(size, 40)))
+    draw = ImageDraw.Draw(card); edge = max(width // 250, 1)
+    draw.rectangle((0, 0, width - 1, height - 1), outline=(200, 40, 40), width=edge); draw.rectangle((edge, edge, width - 1 - edge, height - 1 - edge), outline=(10, 10, 10), width=max(width // 30, 1))
+    if rounded:
+        mask = Image.new('L', size, 0); ImageDraw.Draw(mask).rounded_rectangle((0, 0, width - 1, height - 1), radius=width // 20, fill=255); card.putalpha(mask)
+    return card
+
+def main() -> int:
+    failures = 0
+    for dpi in DPI_CHOICES:
+        ppi_ratio = dpi / 300.0
+        size = (math.floor(CARD_SIZE_300_DPI[0] * ppi_ratio), math.floor(CARD_SIZE_300_DPI[1] * ppi_ratio)); print_bleed = math.ceil(LAYOUT_BLEED * ppi_ratio)
+        cards = {"square": make_test_card(size, False), "rounded": make_test_card(size, True), "alignment": generate_alignment_pattern(size[0], size[1], dpi)}
+        for name, card in cards.items():
+            pages = []
+            for draw in (draw_card_with_border_reference, draw_card_with_border_cameo):
+                page = Image.new('RGB', (size[0] + 2 * MARGIN, size[1] + 2 * MARGIN), 'white'); draw(card, page, (MARGIN, MARGIN, size[0], size[1]), print_bleed, 'black'); pages.append(page)
+            difference = ImageChops.difference(*pages)
+            max_difference = max(high for _, high in difference.getextrema())
+            if max_difference > TOLERANCE: failures += 1; print(f"FAIL: {name} card at {dpi} DPI differs by up to {max_difference} in {difference.getbbox()}")
+            else: print(f"OK: {name} card at {dpi} DPI (max difference {max_difference})")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
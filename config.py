@@ -2,19 +2,19 @@
 Configuration constants for MtgPng2Pdf.
 """
 
-from typing import Dict, Tuple, Set, Any
-from reportlab.lib.pagesizes import letter, legal
+from typing import Dict, Tuple, FrozenSet, Any
 
 # --- Configuration Constants for the image itself ---
 TARGET_IMG_WIDTH_INCHES = 2.48
 TARGET_IMG_HEIGHT_INCHES = 3.46
 
+# Same values as reportlab.lib.pagesizes.letter/legal, kept inline so importing config doesn't load ReportLab
 PAPER_SIZES_PT: Dict[str, Tuple[float, float]] = {
-    "letter": letter, "legal": legal,
+    "letter": (612.0, 792.0), "legal": (612.0, 1008.0),
 }
-BASIC_LAND_NAMES: Set[str] = {
+BASIC_LAND_NAMES: FrozenSet[str] = frozenset({
     "forest", "island", "mountain", "plains", "swamp"
-}
+})
 
 # Embedded layouts.json content
 LAYOUTS_DATA: Dict[str, Any] = {
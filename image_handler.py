@@ -3,39 +3,85 @@ Image handling for MtgPng2Pdf.
 """
 
 import os
-import glob
 import random
+import urllib.parse
+import weakref
 from collections import defaultdict
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterator, Optional, Tuple
 
-from web_utils import download_image, list_webdav_directory
-from parsing_utils import parse_variant_filename
+from web_utils import download_image, ensure_connection_pool_size, list_webdav_directory, remove_temp_file
+from parsing_utils import parse_variant_basename, parse_variant_filename
 
 class ImageSource:
     """Wrapper class to handle both local files and web URLs uniformly"""
-    def __init__(self, path_or_url: str, is_url: bool = False):
+    # One instance exists per discovered image, so skip the per-instance __dict__
+    __slots__ = ('original', 'is_url', 'local_path', 'temp_file', '_temp_file_finalizer', '_filename', '_variant', '__weakref__')
+    def __init__(self, path_or_url: str, is_url: bool = False, variant: Optional[Tuple[str, Optional[str], Optional[str]]] = None):
         self.original = path_or_url
         self.is_url = is_url
         self.local_path = None if is_url else path_or_url
         self.temp_file = None
+        self._temp_file_finalizer: Optional[weakref.finalize] = None
+        self._filename: Optional[str] = None
+        # Discovery already parsed the filename, so it passes the result in rather than having it parsed again
+        self._variant = variant
+    @property
+    def filename(self) -> str:
+        """Basename of the source (URL-decoded for web sources), computed once and reused"""
+        if self._filename is None:
+            self._filename = os.path.basename(urllib.parse.unquote(self.original) if self.is_url else self.original)
+        return self._filename
+    @property
+    def variant(self) -> Tuple[str, Optional[str], Optional[str]]:
+        """(normalized_name, set_code, collector_number) parsed from the source path, computed once and reused"""
+        if self._variant is None: self._variant = parse_variant_filename(self.original)
+        return self._variant
     def get_local_path(self, debug: bool = False) -> Optional[str]:
         """Get a local file path, downloading if necessary"""
         if not self.is_url: return self.local_path
-        if self.temp_file is None: self.temp_file = download_image(self.original, debug=debug)
+        if self.temp_file is None:
+            self.temp_file = download_image(self.original, debug=debug)
+            # Only sources that hold a download get a finalizer; it runs at most once, unlike __del__
+            if self.temp_file: self._temp_file_finalizer = weakref.finalize(self, remove_temp_file, self.temp_file)
         return self.temp_file
     def cleanup(self):
-        """Clean up any temporary files"""
-        if self.temp_file and os.path.exists(self.temp_file):
-            try: os.remove(self.temp_file)
-            except: pass
-            self.temp_file = None
-    def __del__(self): self.cleanup()
+        """Clean up any temporary files (images used in place from the image cache are kept)"""
+        if self._temp_file_finalizer: self._temp_file_finalizer(); self._temp_file_finalizer = None
+        self.temp_file = None
+
+def prefetch_images(image_sources: List[ImageSource], debug: bool = False, max_workers: int = 16):
+    """
+    Download all not-yet-fetched web sources concurrently, so that later
+    get_local_path() calls in the page loops are cache hits instead of serial downloads.
+    """
+    # The same ImageSource appears once per copy in a deck, so deduplicate by identity
+    pending = list({id(src): src for src in image_sources if src.is_url and src.temp_file is None}.values())
+    if not pending: return
+    if debug: print(f"DEBUG: Prefetching {len(pending)} images from the web server")
+    # Blocking downloads in threads are enough here: the GIL is released on socket and file I/O.
+    # The connection pool must be at least as large as the worker count, or extra connections are dropped after each request.
+    num_workers = min(max_workers, len(pending)); ensure_connection_pool_size(num_workers)
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        list(executor.map(lambda src: src.get_local_path(debug), pending))
+
+def _iter_pngs(png_dir: str) -> Iterator[Tuple[str, str]]:
+    """Yield (filename, path) for each PNG file in png_dir using a single directory scan."""
+    with os.scandir(png_dir) as it:
+        for entry in it:
+            name = entry.name
+            # Hidden files are skipped, matching the previous glob("*.png") behaviour
+            if name.startswith('.'): continue
+            # Case-insensitive, so '.Png' is found and nothing is listed twice on case-insensitive filesystems
+            if name.lower().endswith('.png') and entry.is_file():
+                yield name, entry.path
 
 def discover_images(
     png_dir: Optional[str] = None,
     image_server_base_url: Optional[str] = None,
     image_server_path_prefix: str = "/local_art",
-    debug: bool = False
+    debug: bool = False,
+    image_server_recursive: bool = False
 ) -> Dict[str, List[ImageSource]]:
     """
     Discover images from local directory or web server and group them by normalized card name.
@@ -45,13 +91,14 @@ def discover_images(
     
     def process_file(filename: str, source_path: str, is_url: bool):
         # Parse the filename to get the card's base name, which we use as the key.
-        normalized_key, _, _ = parse_variant_filename(filename)
+        # Both sources only return bare '*.png' names, so just drop the extension.
+        variant = parse_variant_basename(filename[:-4]); normalized_key = variant[0]
         
         if not normalized_key:
             if debug: print(f"DEBUG:   Could not determine a key for '{filename}', skipping.")
             return
 
-        img_source = ImageSource(source_path, is_url=is_url)
+        img_source = ImageSource(source_path, is_url=is_url, variant=variant)
         all_cards_map[normalized_key].append(img_source)
         if debug:
             print(f"DEBUG:   Mapped '{filename}' to key '{normalized_key}'")
@@ -62,7 +109,7 @@ def discover_images(
             print(f"DEBUG: Discovering images from web server: {image_server_base_url}")
             print(f"DEBUG: Image source path on server: {image_server_path_prefix}")
         
-        files = list_webdav_directory(image_server_base_url, image_server_path_prefix, debug)
+        files = list_webdav_directory(image_server_base_url, image_server_path_prefix, debug, recursive=image_server_recursive)
         
         for file_info in files:
             process_file(file_info['name'], file_info['href'], is_url=True)
@@ -72,9 +119,8 @@ def discover_images(
         if debug:
             print(f"DEBUG: Scanning PNG directory '{png_dir}' for PNGs...")
         
-        for ext in ("*.png", "*.PNG"):
-            for filepath in glob.glob(os.path.join(png_dir, ext)):
-                process_file(os.path.basename(filepath), filepath, is_url=False)
+        for filename, filepath in _iter_pngs(png_dir):
+            process_file(filename, filepath, is_url=False)
 
     # Shuffle each list of variants to ensure random selection is fair
     for key in all_cards_map:
@@ -11,9 +11,7 @@ from card_processing import process_deck_list, process_extra_card, parse_deck_li
 from config import BASIC_LAND_NAMES, LAYOUTS_DATA
 from image_handler import discover_images, ImageSource
 from output_utils import write_missing_cards_file, print_selection_manifest, copy_deck_pngs, create_png_output
-from parsing_utils import parse_paper_type, normalize_card_name
-from pdf_generator import create_pdf_cameo_style, create_pdf_grid
-from manifest_generator import generate_deck_manifest_image
+from parsing_utils import parse_paper_type, normalize_card_name, resolve_cameo_paper_key
 from web_utils import check_server_file_exists, upload_file_to_server, cleanup_temp_files
 from token_set_manager import load_token_sets, update_token_sets_from_api
 
@@ -32,6 +30,7 @@ def main():
     mode_group.add_argument("--output-file", type=str, default=None, help="Base name for local PDF/PNG grid output, or just the filename for server upload. Extension auto-added. Defaults to MtgProxyOutput, or <deck_list_name> if --deck-list is used.")
     mode_group.add_argument("--output-format", type=str, default="pdf", choices=["pdf", "png"], help="Format for grid layout output (pdf or png). Ignored if --png-out-dir is used.")
     mode_group.add_argument("--png-out-dir", type=str, default=None, help="Output directory for copying PNGs from deck list. If set, grid generation is skipped.")
+    mode_group.add_argument("--link", action="store_true", help="With --png-out-dir, hard-link the PNGs into the output directory instead of copying them where possible. Linked files share their data with the source images, so editing one changes the other. Web images are always copied, so the download cache is never shared.")
     
     # --- MODIFIED: Renamed to be more generic ---
     server_group = parser.add_argument_group('Image Server Options')
@@ -53,6 +52,15 @@ def main():
         "--image-server-png-dir", type=str, default="/",
         help="Relative path (from --image-server-path-prefix) to the directory containing the source PNG files."
     )
+    server_group.add_argument(
+        "--image-server-recursive", action="store_true",
+        help="Also use PNG files in subdirectories of --image-server-png-dir (e.g. one folder per set). "
+             "Lists the whole tree with a single 'Depth: infinity' PROPFIND, or one request per directory if the server refuses that."
+    )
+    server_group.add_argument(
+        "--download-workers", type=int, default=16,
+        help="Maximum number of card images downloaded from the image server at the same time."
+    )
     
     # --- MODIFIED: Renamed to be more generic ---
     server_upload_group = parser.add_argument_group('Image Server Upload Options')
@@ -137,6 +145,7 @@ def main():
         parser.error("Cannot specify both --png-dir and --image-server-base-url. Choose one source.")
     if args.png_out_dir and not args.deck_list:
         parser.error("--png-out-dir requires --deck-list to be specified.")
+    if args.link and not args.png_out_dir: print("Warning: --link is ignored without --png-out-dir.")
     if args.png_out_dir and (args.output_file or args.output_format != "pdf"):
         if args.output_file: print("Warning: --output-file is ignored when --png-out-dir is used.")
         if args.output_format != "pdf": print(f"Warning: --output-format {args.output_format} is ignored when --png-out-dir is used.")
@@ -145,6 +154,8 @@ def main():
         parser.error("--cameo-label-font-size must be between 8 and 96.")
     if args.deck_manifest_font_size != 0 and not (8 <= args.deck_manifest_font_size <= 96):
         parser.error("--deck-manifest-font-size must be between 8 and 96, or 0 for auto-sizing.")
+    if args.download_workers < 1:
+        parser.error("--download-workers must be at least 1.")
     
     if args.upload_to_server:
         if not args.image_server_base_url:
@@ -223,7 +234,8 @@ def main():
         png_dir=args.png_dir,
         image_server_base_url=args.image_server_base_url,
         image_server_path_prefix=png_source_path_on_server,
-        debug=args.debug
+        debug=args.debug,
+        image_server_recursive=args.image_server_recursive
     )
     if not all_cards_map:
         print("No images found in source. Exiting."); return
@@ -242,9 +254,7 @@ def main():
             if not args.cameo:
                 print("Error: --alignment-sheet currently only supports --cameo mode."); return
             
-            cameo_paper_key = validated_paper_type
-            if cameo_paper_key == "letter" and args.cameo_orientation == "portrait":
-                cameo_paper_key = "letter_portrait"
+            cameo_paper_key = resolve_cameo_paper_key(validated_paper_type, args.cameo_orientation)
             
             if cameo_paper_key not in LAYOUTS_DATA["paper_layouts"]:
                 print(f"Error: Alignment sheet: Paper type '{args.paper_type}' with orientation '{args.cameo_orientation}' is not supported."); return
@@ -300,6 +310,7 @@ def main():
                 name_for_pdf_label = os.path.basename(base_output_filename_final)
 
             if args.deck_manifest and args.deck_list and selection_manifest:
+                from manifest_generator import generate_deck_manifest_image
                 manifest_path = os.path.join(os.path.dirname(args.deck_list), "deck_manifest.png")
                 generate_deck_manifest_image(
                     selection_manifest,
@@ -327,9 +338,7 @@ def main():
             # --- Handle Extra Cards ---
             if args.extra_card and not args.png_out_dir:
                 if args.cameo:
-                    cameo_paper_key = validated_paper_type
-                    if cameo_paper_key == "letter" and args.cameo_orientation == "portrait":
-                        cameo_paper_key = "letter_portrait"
+                    cameo_paper_key = resolve_cameo_paper_key(validated_paper_type, args.cameo_orientation)
                     layout_config = LAYOUTS_DATA["paper_layouts"].get(cameo_paper_key, {})
                     card_layout = layout_config.get("card_layouts", {}).get("standard", {})
                     num_cols = len(card_layout.get("x_pos", []))
@@ -363,9 +372,7 @@ def main():
             # --- Handle Extra Deck Manifests ---
             if args.extra_deck_manifest and not args.png_out_dir:
                 if args.cameo:
-                    cameo_paper_key = validated_paper_type
-                    if cameo_paper_key == "letter" and args.cameo_orientation == "portrait":
-                        cameo_paper_key = "letter_portrait"
+                    cameo_paper_key = resolve_cameo_paper_key(validated_paper_type, args.cameo_orientation)
                     layout_config = LAYOUTS_DATA["paper_layouts"].get(cameo_paper_key, {})
                     card_layout = layout_config.get("card_layouts", {}).get("standard", {})
                     num_cols = len(card_layout.get("x_pos", []))
@@ -379,6 +386,7 @@ def main():
                     if num_slots_on_last_page > 0:
                         num_empty_slots = cards_per_page - num_slots_on_last_page
                         print(f"\n--- Filling {num_empty_slots} empty slots with extra deck manifests ---")
+                        from manifest_generator import generate_deck_manifest_image
                         extra_manifests_processed = 0
                         for extra_deck_path in args.extra_deck_manifest:
                             if extra_manifests_processed >= num_empty_slots:
@@ -419,12 +427,11 @@ def main():
         elif not args.png_out_dir:
             print("\n--- Directory Scan Mode (for PDF/PNG grid) ---")
             if args.skip_basic_land:
-                image_sources_to_process = [
-                    source for name, sources in all_cards_map.items() 
-                    if name not in BASIC_LAND_NAMES
-                    for source in sources
-                ]
-                skipped_basics_count = sum(len(sources) for name, sources in all_cards_map.items() if name in BASIC_LAND_NAMES)
+                # Map keys are already normalized card names, so one pass both filters and counts basics
+                skipped_basics_count = 0
+                for name, sources in all_cards_map.items():
+                    if name in BASIC_LAND_NAMES: skipped_basics_count += len(sources)
+                    else: image_sources_to_process.extend(sources)
                 if skipped_basics_count > 0:
                     print(f"  Skipped {skipped_basics_count} basic land files.")
             else:
@@ -454,7 +461,7 @@ def main():
             if not args.deck_list:
                 print("Critical Error: --png-out-dir mode reached without a deck list. Please report this bug."); return
             if image_sources_to_process:
-                copy_deck_pngs(image_sources_to_process, args.png_out_dir, args.debug)
+                copy_deck_pngs(image_sources_to_process, args.png_out_dir, args.debug, download_workers=args.download_workers, link=args.link)
             elif not missing_cards_from_deck:
                 print("No images to copy (deck list may have contained only skipped basic lands or was empty).")
         else:
@@ -462,6 +469,8 @@ def main():
                 print("No images to generate grid output. Exiting."); return
             
             if args.output_format == "pdf":
+                # PIL and ReportLab are only loaded when a PDF is actually generated
+                from pdf_generator import create_pdf_cameo_style, create_pdf_grid
                 output_pdf_filename = f"{os.path.basename(base_output_filename_final)}.pdf"
                 pdf_buffer = None
                 if args.upload_to_server:
@@ -499,12 +508,14 @@ def main():
                         orientation=args.cameo_orientation,
                         alignment_sheet=args.alignment_sheet,
                         global_offset=tuple(args.cameo_global_offset) if args.cameo_global_offset else (0.0, 0.0),
-                        slot_offsets=slot_offsets
+                        slot_offsets=slot_offsets,
+                        download_workers=args.download_workers
                     )
                 else:
-                    create_pdf_grid(image_sources=image_sources_to_process, output_path_or_buffer=output_target, paper_type_str=validated_paper_type, image_spacing_pixels=args.image_spacing_pixels, dpi=args.dpi, page_margin_str=args.page_margin, page_background_color_str=args.page_bg_color, image_cell_background_color_str=args.image_cell_bg_color, cut_lines=args.cut_lines, cut_line_length_str=args.cut_line_length, cut_line_color_str=args.cut_line_color, cut_line_width_pt=args.cut_line_width_pt, debug=args.debug)
+                    create_pdf_grid(image_sources=image_sources_to_process, output_path_or_buffer=output_target, paper_type_str=validated_paper_type, image_spacing_pixels=args.image_spacing_pixels, dpi=args.dpi, page_margin_str=args.page_margin, page_background_color_str=args.page_bg_color, image_cell_background_color_str=args.image_cell_bg_color, cut_lines=args.cut_lines, cut_line_length_str=args.cut_line_length, cut_line_color_str=args.cut_line_color, cut_line_width_pt=args.cut_line_width_pt, debug=args.debug, download_workers=args.download_workers)
                 
-                if args.upload_to_server and pdf_buffer:
+                # Nothing is uploaded if the generator wrote nothing (e.g. no images could be loaded)
+                if args.upload_to_server and pdf_buffer is not None and pdf_buffer.getbuffer().nbytes:
                     print("\n--- Uploading PDF to Server ---")
                     # --- MODIFIED: Construct the full upload URL ---
                     # Join the base prefix, the relative PDF directory, and the filename.
@@ -543,6 +554,7 @@ def main():
                         pdf_name_label=name_for_pdf_label,
                         cameo_label_font_size=args.cameo_label_font_size,
                         debug=args.debug,
+                        download_workers=args.download_workers,
                         upload_to_server=True,
                         image_server_base_url=args.image_server_base_url,
                         image_server_path_prefix=args.image_server_path_prefix,
@@ -568,6 +580,7 @@ def main():
                         pdf_name_label=name_for_pdf_label,
                         cameo_label_font_size=args.cameo_label_font_size,
                         debug=args.debug,
+                        download_workers=args.download_workers,
                         orientation=args.cameo_orientation
                     )
             else:
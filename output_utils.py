@@ -4,11 +4,11 @@ Output utilities for MtgPng2Pdf.
 
 import os
 import shutil
-import urllib.parse
-from collections import defaultdict
-from typing import List, Dict, Union
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Union
 
-from image_handler import ImageSource
+from image_handler import ImageSource, prefetch_images
 
 def print_selection_manifest(manifest: Dict[str, Dict[str, Dict[str, int]]]):
     """Prints a formatted summary of which card versions were selected."""
@@ -38,29 +38,31 @@ def write_missing_cards_file(deck_list_path: str, missing_cards: List[str]):
     missing_filename = f"{deck_list_basename_no_ext}_missing.txt"
     missing_filepath = os.path.join(deck_list_dir, missing_filename) if deck_list_dir else missing_filename
     try:
-        if deck_list_dir and not os.path.exists(deck_list_dir): os.makedirs(deck_list_dir, exist_ok=True)
+        if deck_list_dir: os.makedirs(deck_list_dir, exist_ok=True)
         with open(missing_filepath, 'w', encoding='utf-8') as f:
-            for card_name in sorted(missing_cards): f.write(f"{card_name}\n")
+            f.write("\n".join(sorted(missing_cards)) + "\n")
         print(f"List of missing cards saved to: {missing_filepath}")
     except IOError as e: print(f"Error writing missing cards file '{missing_filepath}': {e}")
 
 import io
 import math
 import os
-from PIL import Image, ImageDraw, ImageFont
 
-from parsing_utils import parse_dimension_to_pixels
+from parsing_utils import parse_dimension_to_pixels, resolve_cameo_paper_key
 from config import TARGET_IMG_WIDTH_INCHES, TARGET_IMG_HEIGHT_INCHES
 
 from typing import List, Dict, Union, Optional
 
-from config import LAYOUTS_DATA, CameoPaperSize, CameoCardSize, TARGET_IMG_WIDTH_INCHES, TARGET_IMG_HEIGHT_INCHES
-from image_handler import ImageSource
-from pdf_generator import draw_card_layout_cameo, calculate_max_print_bleed_cameo
+from config import LAYOUTS_DATA, CameoCardSize, TARGET_IMG_WIDTH_INCHES, TARGET_IMG_HEIGHT_INCHES
+from image_handler import ImageSource, prefetch_images
 
 from web_utils import check_server_file_exists, upload_file_to_server
 
 def create_png_output(image_sources: List[ImageSource], output_path_or_buffer: Union[str, io.BytesIO], **kwargs):
+    # PIL (and pdf_generator, which pulls in ReportLab) are imported lazily so --png-out-dir runs don't load them
+    from PIL import Image, ImageDraw, ImageFont
+    from pdf_generator import draw_card_layout_cameo, calculate_max_print_bleed_cameo, open_card_image, load_label_font
+
     print(f"\n--- PNG Page Generation (PIL-based) ---")
     
     upload_to_server = kwargs.get("upload_to_server", False)
@@ -77,9 +79,7 @@ def create_png_output(image_sources: List[ImageSource], output_path_or_buffer: U
     debug = kwargs.get("debug", False)
     orientation = kwargs.get("orientation", "landscape")
 
-    cameo_paper_key = paper_type_arg.lower()
-    if cameo_paper_key == "letter" and orientation == "portrait":
-        cameo_paper_key = CameoPaperSize.LETTER_PORTRAIT
+    cameo_paper_key = resolve_cameo_paper_key(paper_type_arg, orientation)
     
     if cameo_paper_key not in LAYOUTS_DATA["paper_layouts"]:
         print(f"Error: --cameo PNG generation: Paper type '{paper_type_arg}' with orientation '{orientation}' (key: {cameo_paper_key}) is not directly supported by embedded cameo layouts."); return
@@ -107,6 +107,7 @@ def create_png_output(image_sources: List[ImageSource], output_path_or_buffer: U
 
     pil_cell_bg_color: Union[str, Tuple[int,int,int], None] = image_cell_bg_color_str
     total_images_to_process = len(image_sources)
+    prefetch_images(image_sources, debug, kwargs.get("download_workers", 16))
 
     for page_start_index in range(0, total_images_to_process, num_cards_per_page):
         current_page_pil_image = master_page_background.copy()
@@ -115,7 +116,7 @@ def create_png_output(image_sources: List[ImageSource], output_path_or_buffer: U
         for img_source in image_sources_for_this_page:
             try:
                 local_path = img_source.get_local_path(debug)
-                if local_path: img = Image.open(local_path); img = img.convert('RGBA'); pil_card_images_for_page.append(img)
+                if local_path: pil_card_images_for_page.append(open_card_image(local_path))
                 else: raise Exception("Failed to get local path")
             except Exception as e:
                 print(f"  Warning: Could not process image '{img_source.original}': {e}")
@@ -139,7 +140,7 @@ def create_png_output(image_sources: List[ImageSource], output_path_or_buffer: U
             font_size_scaled = math.floor(label_font_size_base * ppi_ratio)
             page_font = None
             try: 
-                script_dir = os.path.dirname(os.path.abspath(__file__)); font_path = os.path.join(script_dir, "assets", "DejaVuSans.ttf"); page_font = ImageFont.truetype(font_path, size=font_size_scaled)
+                page_font = load_label_font(font_size_scaled)
             except IOError: print("  Warning: Font 'assets/DejaVuSans.ttf' not found.");
             except Exception: pass
             if page_font: draw_page_text.text((text_x_pos, text_y_pos), label_text, fill=(0,0,0), anchor="ra", font=page_font)
@@ -176,24 +177,79 @@ def create_png_output(image_sources: List[ImageSource], output_path_or_buffer: U
             current_page_pil_image.save(page_filename, format='PNG', compress_level=6)
             print(f"PNG page {page_num_for_label} saved to {page_filename}")
 
-def copy_deck_pngs(image_sources: List[ImageSource], png_out_dir: str, debug: bool = False):
+def _link_file(local_path: str, dest_path: str) -> bool:
+    """Hard-links dest_path to local_path, replacing an existing file. Returns False if linking isn't possible (e.g. another filesystem)."""
+    try: os.link(local_path, dest_path); return True
+    except FileExistsError:
+        try: os.remove(dest_path); os.link(local_path, dest_path); return True
+        except OSError: return False
+    except OSError: return False
+
+def _copy_file_range(local_path: str, dest_path: str) -> bool:
+    """
+    Copies a file inside the kernel with copy_file_range, which shares the data blocks instead (a reflink) on
+    filesystems that support it (Btrfs, XFS). Returns False if it isn't supported here, so the caller copies normally.
+    """
+    if not hasattr(os, 'copy_file_range'): return False
+    try:
+        with open(local_path, 'rb') as src, open(dest_path, 'wb') as dst:
+            remaining = os.fstat(src.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                if not copied: return False
+                remaining -= copied
+        return True
+    except OSError: return False
+
+def copy_deck_pngs(image_sources: List[ImageSource], png_out_dir: str, debug: bool = False, download_workers: int = 16, link: bool = False):
     if not image_sources: print("No images to copy."); return
-    if not os.path.exists(png_out_dir):
-        try: os.makedirs(png_out_dir); print(f"Created output directory: {png_out_dir}")
-        except OSError as e: print(f"Error: Could not create output directory '{png_out_dir}': {e}"); return
-    elif not os.path.isdir(png_out_dir): print(f"Error: Output path '{png_out_dir}' exists but is not a directory."); return
+    # Create first and handle "already exists" afterwards, rather than checking and then creating
+    try: os.makedirs(png_out_dir); print(f"Created output directory: {png_out_dir}")
+    except FileExistsError:
+        if not os.path.isdir(png_out_dir): print(f"Error: Output path '{png_out_dir}' exists but is not a directory."); return
+    except OSError as e: print(f"Error: Could not create output directory '{png_out_dir}': {e}"); return
     print(f"\n--- Copying PNGs to '{png_out_dir}' ---")
-    source_file_copy_counts = defaultdict(int); copied_count = 0
-    for img_source in image_sources:
+    # Repeated art is known up front: count copies per source once, then resolve each unique source a single time.
+    # Jobs are grouped by source file so each source is read only once, however many copies it has.
+    source_file_copy_counts = Counter(img_source.original for img_source in image_sources)
+    first_sources = {img_source.original: img_source for img_source in reversed(image_sources)}
+    prefetch_images(list(first_sources.values()), debug, download_workers)
+    copy_jobs: Dict[str, List[str]] = {}; dest_prefix = os.path.join(png_out_dir, "")  # Directory with trailing separator
+    # Web images resolve to files in the shared image cache; a link there would let an edited output corrupt the cache
+    cached_paths = set()
+    for source_key, num_copies in source_file_copy_counts.items():
+        img_source = first_sources[source_key]
         local_path = img_source.get_local_path(debug)
         if not local_path: print(f"Warning: Could not get image from {img_source.original}"); continue
-        if img_source.is_url: original_basename = os.path.basename(urllib.parse.unquote(img_source.original))
-        else: original_basename = os.path.basename(img_source.original)
-        base, ext = os.path.splitext(original_basename)
-        source_key = img_source.original; source_file_copy_counts[source_key] += 1; current_copy_num = source_file_copy_counts[source_key]
-        if current_copy_num == 1: dest_basename = original_basename
-        else: dest_basename = f"{base}-{current_copy_num}{ext}"
-        dest_path = os.path.join(png_out_dir, dest_basename)
-        try: shutil.copy2(local_path, dest_path); copied_count += 1
-        except Exception as e: print(f"Error copying to '{dest_path}': {e}")
+        if img_source.is_url: cached_paths.add(local_path)
+        original_basename = img_source.filename; base, ext = os.path.splitext(original_basename)
+        dest_basenames = [original_basename] + [f"{base}-{copy_num}{ext}" for copy_num in range(2, num_copies + 1)]
+        copy_jobs.setdefault(local_path, []).extend(dest_prefix + dest_basename for dest_basename in dest_basenames)
+    def copy_source(job: Tuple[str, List[str]]) -> int:
+        local_path, dest_paths = job; copied = 0
+        if link and local_path not in cached_paths:
+            # Linking is an inode-only operation; files are only copied where it fails
+            unlinked_paths = [dest_path for dest_path in dest_paths if not _link_file(local_path, dest_path)]
+            copied = len(dest_paths) - len(unlinked_paths)
+            if not unlinked_paths: return copied
+            if debug: print(f"DEBUG: Could not hard-link '{local_path}', copying it instead")
+            dest_paths = unlinked_paths
+        # Stops at the first failure: copy_file_range is unsupported for the whole pair of filesystems, not per file
+        while dest_paths and _copy_file_range(local_path, dest_paths[0]): copied += 1; dest_paths = dest_paths[1:]
+        if not dest_paths: return copied
+        if len(dest_paths) == 1:
+            try: shutil.copyfile(local_path, dest_paths[0]); return copied + 1
+            except Exception as e: print(f"Error copying to '{dest_paths[0]}': {e}"); return copied
+        try:
+            with open(local_path, 'rb') as f: data = f.read()
+        except OSError as e: print(f"Error reading '{local_path}': {e}"); return copied
+        for dest_path in dest_paths:
+            try:
+                with open(dest_path, 'wb') as f: f.write(data)
+                copied += 1
+            except OSError as e: print(f"Error copying to '{dest_path}': {e}")
+        return copied
+    # Copies are I/O-bound and release the GIL, so threads overlap the read/write latency
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        copied_count = sum(executor.map(copy_source, copy_jobs.items()))
     print(f"Successfully copied {copied_count} PNG files to '{png_out_dir}'.")
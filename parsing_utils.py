@@ -2,13 +2,25 @@
 Parsing utilities for MtgPng2Pdf.
 """
 
+import functools
 import os
 import re
 import unicodedata
 from typing import Optional, NamedTuple, Tuple
 
-from config import PAPER_SIZES_PT
+from config import PAPER_SIZES_PT, CameoPaperSize
 
+# Separator characters (Parity with ccAutomator) that become hyphens in a normalized name.
+_NORMALIZE_SEPARATORS = "_/:<>\"\\|?*&-"
+# Translation table over ASCII: keeps a-z/0-9, maps separators and whitespace to a space
+# and deletes everything else (punctuation, uppercase left over from NFKD, control chars).
+_NORMALIZE_TABLE = {
+    code: " " if chr(code).isspace() or chr(code) in _NORMALIZE_SEPARATORS else None
+    for code in range(128)
+    if not ("a" <= chr(code) <= "z" or "0" <= chr(code) <= "9")
+}
+
+@functools.lru_cache(maxsize=65536)
 def normalize_card_name(name: str) -> str:
     """
     A robust function to normalize a card name for consistent key generation.
@@ -16,17 +28,19 @@ def normalize_card_name(name: str) -> str:
     Matches ccAutomator's generate_safe_filename logic.
     """
     name = name.lower().strip()
-    # Decompose unicode characters (like accents) into base characters
-    normalized_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
-    # Replace spaces, underscores, and slashes with hyphens (Parity with ccAutomator)
-    normalized_name = re.sub(r"[\s_/:<>:\"\\|?*&]+", "-", normalized_name)
-    # Remove common punctuation
-    normalized_name = re.sub(r"['\.,\(\)\[\]]", "", normalized_name)
-    # Remove any remaining non-alphanumeric characters (except hyphens)
-    normalized_name = re.sub(r"[^a-z0-9-]", "", normalized_name)
-    # Collapse multiple hyphens and strip from ends (Parity with ccAutomator)
-    normalized_name = re.sub(r"-+", "-", normalized_name)
-    return normalized_name.strip("-")
+    if name.isascii():
+        # Nearly all card names are plain ASCII; nothing to decompose
+        normalized_name = name
+    else:
+        # Decompose unicode characters (like accents) into base characters,
+        # using the quick check to skip the decomposition when it is a no-op
+        if not unicodedata.is_normalized('NFKD', name):
+            name = unicodedata.normalize('NFKD', name)
+        normalized_name = name.encode('ascii', 'ignore').decode('ascii')
+    # Drop punctuation and turn separators into spaces in a single C-level pass
+    normalized_name = normalized_name.translate(_NORMALIZE_TABLE)
+    # Collapse separator runs into single hyphens, stripped from both ends (Parity with ccAutomator)
+    return "-".join(normalized_name.split())
 
 # Data structure for a parsed deck list line
 class DecklistEntry(NamedTuple):
@@ -53,6 +67,9 @@ MOXFIELD_LINE_RE = re.compile(
     re.IGNORECASE
 )
 
+# Leading count for pipe-format lines ("1 Card Name | SET | NUM")
+PIPE_LINE_RE = re.compile(r"^\s*(?P<count>\d+)x?\s+(?P<rest>.+)$")
+
 def parse_moxfield_line(line: str) -> Optional[DecklistEntry]:
     """Parses a deck list line into its components.
     Supports:
@@ -67,7 +84,7 @@ def parse_moxfield_line(line: str) -> Optional[DecklistEntry]:
     # --- Pass 1: Pipe Format (Parity with ccAutomator) ---
     if '|' in stripped_line:
         # Regex to handle leading count and then splitting by pipes
-        pipe_match = re.match(r"^\s*(?P<count>\d+)x?\s+(?P<rest>.+)$", stripped_line)
+        pipe_match = PIPE_LINE_RE.match(stripped_line)
         if pipe_match:
             count = int(pipe_match.group('count'))
             rest = pipe_match.group('rest')
@@ -111,27 +128,38 @@ def parse_moxfield_line(line: str) -> Optional[DecklistEntry]:
         original_line=line
     )
 
+# Filename parts are separated by either hyphens or underscores; set codes are plain alphanumerics.
+# VARIANT_SUFFIX_RE splits off the last two parts (set and number) in one match; the greedy name
+# group makes them the last two separators, the same parts a full split would end with.
+VARIANT_SUFFIX_RE = re.compile(r'(?P<name>.*)[-_](?P<set>[^-_]*)[-_](?P<number>[^-_]*)', re.DOTALL)
+SET_CODE_LIKE_RE = re.compile(r'^[a-z0-9]+$')
+
 def parse_variant_filename(filename: str) -> Tuple[str, Optional[str], Optional[str]]:
     """
     Parses a card filename like 'Memory-Lapse_ema_60.png' or 'Dandân_arn_12.png'.
     Returns (normalized_name, set_code, collector_number)
     """
-    basename_no_ext = os.path.splitext(os.path.basename(filename))[0]
-    # Split by either hyphen or underscore to handle different naming conventions
-    parts = re.split(r'[-_]', basename_no_ext)
+    return parse_variant_basename(os.path.splitext(os.path.basename(filename))[0])
 
+def parse_variant_basename(basename_no_ext: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    Same as parse_variant_filename, for a filename already stripped of its directory and extension
+    (e.g. 'Memory-Lapse_ema_60'). Used when scanning many files whose names are already known.
+    """
+    # Parts are separated by either hyphen or underscore to handle different naming conventions.
     # Heuristic: If there are at least 3 parts, the last two are likely set/number.
     # This handles "Card-Name-SET-NUM" and "Card_Name_SET_NUM".
-    if len(parts) >= 3:
+    match = VARIANT_SUFFIX_RE.fullmatch(basename_no_ext)
+    if match:
         # A simple check to see if the second-to-last part looks like a set code.
         # Most set codes are 3-5 alphanumeric characters.
-        is_set_like = 3 <= len(parts[-2]) <= 5 and re.match(r'^[a-z0-9]+$', parts[-2].lower())
+        set_code = match.group('set').lower()
+        is_set_like = 3 <= len(set_code) <= 5 and SET_CODE_LIKE_RE.match(set_code)
 
         if is_set_like:
-            collector_number = parts[-1].lower()
-            set_code = parts[-2].lower()
+            collector_number = match.group('number').lower()
             # Everything before the set and number is the card name.
-            name_str = "-".join(parts[:-2])
+            name_str = match.group('name').replace('_', '-')
             normalized_name = normalize_card_name(name_str)
             return normalized_name, set_code, collector_number
 
@@ -139,24 +167,36 @@ def parse_variant_filename(filename: str) -> Tuple[str, Optional[str], Optional[
     # treat the whole thing as the name. This handles "Sol Ring.png".
     return normalize_card_name(basename_no_ext), None, None
 
+# Splits a dimension like '5mm', '0.25 in' or '10px' into its numeric value and unit
+DIMENSION_RE = re.compile(r"^(?P<value>\d+(?:\.\d*)?|\.\d+)?\s*(?P<unit>.*)$", re.DOTALL)
+# Units per inch for the physical units; pixels are used as given
+UNITS_PER_INCH = {"in": 1.0, "\"": 1.0, "mm": 25.4}
+
+@functools.lru_cache(maxsize=128)
 def parse_dimension_to_pixels(dim_str: str, dpi: int, default_unit_is_mm: bool = False) -> int:
-    dim_str = dim_str.lower().strip(); val_str = ""; unit_str = ""
-    for char in dim_str:
-        if char.isdigit() or char == '.': val_str += char
-        else: unit_str += char
+    dim_str = dim_str.lower().strip()
+    match = DIMENSION_RE.match(dim_str); val_str = match.group('value'); unit_str = match.group('unit')
     if not val_str: raise ValueError(f"No numeric value in dimension: '{dim_str}'")
     value = float(val_str)
-    pixels = 0
-    if unit_str == "in" or unit_str == "\"": pixels = value * dpi
-    elif unit_str == "mm": pixels = (value / 25.4) * dpi
-    elif unit_str == "px": pixels = value
-    elif not unit_str and default_unit_is_mm: pixels = (value / 25.4) * dpi
-    elif not unit_str: raise ValueError(f"Dimension '{dim_str}' lacks units (in, mm, px).")
-    else: raise ValueError(f"Unknown unit '{unit_str}' in '{dim_str}'. Use in, mm, px.")
-    return int(round(pixels))
+    if not unit_str:
+        if not default_unit_is_mm: raise ValueError(f"Dimension '{dim_str}' lacks units (in, mm, px).")
+        unit_str = "mm"
+    if unit_str == "px": return int(round(value))
+    units_per_inch = UNITS_PER_INCH.get(unit_str)
+    if units_per_inch is None: raise ValueError(f"Unknown unit '{unit_str}' in '{dim_str}'. Use in, mm, px.")
+    return int(round((value / units_per_inch) * dpi))
 
+@functools.lru_cache(maxsize=128)
 def parse_paper_type(size_str: str) -> str:
     size_str = size_str.lower().strip()
     if size_str not in PAPER_SIZES_PT:
         raise ValueError(f"Invalid paper type: '{size_str}'. Supported: {', '.join(PAPER_SIZES_PT.keys())}")
     return size_str
+
+# Cameo layouts are keyed by paper type, except where an orientation has a layout of its own
+CAMEO_PAPER_KEYS = {("letter", "portrait"): CameoPaperSize.LETTER_PORTRAIT}
+
+def resolve_cameo_paper_key(paper_type: str, orientation: str) -> str:
+    """Returns the LAYOUTS_DATA["paper_layouts"] key for a paper type printed in the given Cameo orientation."""
+    paper_type = paper_type.lower()
+    return CAMEO_PAPER_KEYS.get((paper_type, orientation), paper_type)
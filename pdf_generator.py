@@ -2,20 +2,33 @@
 PDF generation for MtgPng2Pdf.
 """
 
+import functools
 import io
 import math
 import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import List, Union, Tuple, Optional
 
 from PIL import Image, ImageDraw, ImageFont
+from reportlab import rl_config
 from reportlab.lib import colors as reportlab_colors
 from reportlab.lib.pagesizes import letter, legal
 from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfgen import canvas
 
-from config import LAYOUTS_DATA, CameoPaperSize, CameoCardSize, TARGET_IMG_WIDTH_INCHES, TARGET_IMG_HEIGHT_INCHES, PAPER_SIZES_PT
-from image_handler import ImageSource
-from parsing_utils import parse_dimension_to_pixels
+from config import LAYOUTS_DATA, CameoCardSize, TARGET_IMG_WIDTH_INCHES, TARGET_IMG_HEIGHT_INCHES, PAPER_SIZES_PT
+from image_handler import ImageSource, prefetch_images
+from parsing_utils import parse_dimension_to_pixels, resolve_cameo_paper_key
+
+# Font for page labels and alignment patterns, shipped in assets/
+LABEL_FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "DejaVuSans.ttf")
+
+@functools.lru_cache(maxsize=16)
+def load_label_font(size: int) -> ImageFont.FreeTypeFont:
+    """Loads the label font at a size once, instead of re-reading and parsing the TTF for every page. Raises IOError if it is missing."""
+    return ImageFont.truetype(LABEL_FONT_PATH, size=size)
 
 def calculate_max_print_bleed_cameo(x_pos: List[int], y_pos: List[int], width: int, height: int) -> int:
     if len(x_pos) == 1 and len(y_pos) == 1: return 0
@@ -33,20 +46,39 @@ def calculate_max_print_bleed_cameo(x_pos: List[int], y_pos: List[int], width: i
     # This prevents 'massive borders' and overlapping reg marks.
     return 12
 
-def draw_card_with_border_cameo(card_image: Image.Image, base_image: Image.Image, box: tuple[int, int, int, int], print_bleed: int, cell_bg_color_pil: Union[str, Tuple[int, int, int], None]):
+def draw_card_with_border_cameo(card_image: Image.Image, base_image: Image.Image, box: tuple[int, int, int, int], print_bleed: int, cell_bg_color_pil: Union[str, Tuple[int, int, int], None]) -> Tuple[int, int, int, int]:
+    """Draws a card with its print bleed; returns the (left, upper, right, lower) page region drawn on."""
     origin_x, origin_y, origin_width, origin_height = box
-    if cell_bg_color_pil is not None:
-        draw = ImageDraw.Draw(base_image)
-        if print_bleed > 0: max_offset = print_bleed - 1 if print_bleed > 0 else 0; cell_rect_x0 = origin_x - max_offset; cell_rect_y0 = origin_y - max_offset; cell_rect_x1 = origin_x + origin_width + max_offset; cell_rect_y1 = origin_y + origin_height + max_offset
-        else: cell_rect_x0 = origin_x; cell_rect_y0 = origin_y; cell_rect_x1 = origin_x + origin_width; cell_rect_y1 = origin_y + origin_height
-        draw.rectangle([cell_rect_x0, cell_rect_y0, cell_rect_x1, cell_rect_y1], fill=cell_bg_color_pil)
-    for i in reversed(range(print_bleed)):
-        card_image_resized_for_this_iteration = card_image.resize((origin_width + (2 * i), origin_height + (2 * i)))
-        paste_pos_x = origin_x - i; paste_pos_y = origin_y - i
-        base_image.paste(card_image_resized_for_this_iteration, (paste_pos_x, paste_pos_y), card_image_resized_for_this_iteration if card_image_resized_for_this_iteration.mode == 'RGBA' else None)
+    max_offset = max(print_bleed - 1, 0); drawn_box = (origin_x - max_offset, origin_y - max_offset, origin_x + origin_width + max_offset + 1, origin_y + origin_height + max_offset + 1)
+    # The cell background is a solid fill of the whole drawn area, which a color paste does directly
+    if cell_bg_color_pil is not None: base_image.paste(cell_bg_color_pil, drawn_box)
+    if print_bleed <= 0: return drawn_box
+    # reducing_gap lets Pillow shrink large scans by an integer factor first (a fast box reduce) before the
+    # final resample; only kicks in at 3x or more, where the difference is at most one level per channel
+    card_image_resized = card_image if card_image.size == (origin_width, origin_height) else card_image.resize((origin_width, origin_height), reducing_gap=3.0)
+    if max_offset > 0:
+        # The bleed is a stack of copies of the card enlarged by 2px per bleed pixel, outermost first. Of each copy only
+        # its outer 1px ring shows (the next copy covers the rest) apart from around transparent (rounded) corners, so
+        # only the ring and corner patches are resized, straight from the card (resize's box) rather than the whole copy.
+        card_w, card_h = card_image_resized.size; patch = min(max_offset + card_w // 10, card_w, card_h)
+        for offset in range(max_offset, 0, -1):
+            layer_w = card_w + 2 * offset; layer_h = card_h + 2 * offset; scale_x = card_w / layer_w; scale_y = card_h / layer_h
+            layer_x = origin_x - offset; layer_y = origin_y - offset
+            # (left, upper, right, lower) of each part in the enlarged copy; the ring's sides stop short of the corner patches
+            for part_x0, part_y0, part_x1, part_y1 in ((0, 0, patch, patch), (layer_w - patch, 0, layer_w, patch), (0, layer_h - patch, patch, layer_h), (layer_w - patch, layer_h - patch, layer_w, layer_h),
+                                                       (patch, 0, layer_w - patch, 1), (patch, layer_h - 1, layer_w - patch, layer_h), (0, patch, 1, layer_h - patch), (layer_w - 1, patch, layer_w, layer_h - patch)):
+                box_x0 = part_x0 * scale_x; box_y0 = part_y0 * scale_y; box_x1 = part_x1 * scale_x; box_y1 = part_y1 * scale_y
+                # Resizing an RGBA image converts all of it, so crop to the part plus the filter's reach (2px for bicubic) first
+                crop_x0 = max(math.floor(box_x0) - 3, 0); crop_y0 = max(math.floor(box_y0) - 3, 0)
+                source = card_image_resized.crop((crop_x0, crop_y0, min(math.ceil(box_x1) + 3, card_w), min(math.ceil(box_y1) + 3, card_h)))
+                part_image = source.resize((part_x1 - part_x0, part_y1 - part_y0), Image.BICUBIC, box=(box_x0 - crop_x0, box_y0 - crop_y0, box_x1 - crop_x0, box_y1 - crop_y0))
+                base_image.paste(part_image, (layer_x + part_x0, layer_y + part_y0), part_image if part_image.mode == 'RGBA' else None)
+    base_image.paste(card_image_resized, (origin_x, origin_y), card_image_resized if card_image_resized.mode == 'RGBA' else None)
+    return drawn_box
 
-def draw_card_layout_cameo(card_images: List[Image.Image], base_image: Image.Image, num_rows: int, num_cols: int, x_pos_layout: List[int], y_pos_layout: List[int], card_width_layout: int, card_height_layout: int, print_bleed_layout_units: int, crop_percentage: float, ppi_ratio: float, extend_corners_src_px: int, flip: bool, cell_bg_color_pil: Union[str, Tuple[int, int, int], None], global_offset: Tuple[float, float] = (0.0, 0.0), slot_offsets: dict[int, Tuple[float, float]] = None):
+def draw_card_layout_cameo(card_images: List[Image.Image], base_image: Image.Image, num_rows: int, num_cols: int, x_pos_layout: List[int], y_pos_layout: List[int], card_width_layout: int, card_height_layout: int, print_bleed_layout_units: int, crop_percentage: float, ppi_ratio: float, extend_corners_src_px: int, flip: bool, cell_bg_color_pil: Union[str, Tuple[int, int, int], None], global_offset: Tuple[float, float] = (0.0, 0.0), slot_offsets: dict[int, Tuple[float, float]] = None) -> List[Tuple[int, int, int, int]]:
     num_slots_on_page = num_rows * num_cols
+    drawn_boxes: List[Tuple[int, int, int, int]] = []
     mm_to_px_scaled = (300.0 * ppi_ratio) / 25.4
     if slot_offsets is None: slot_offsets = {}
     
@@ -80,7 +112,8 @@ def draw_card_layout_cameo(card_images: List[Image.Image], base_image: Image.Ima
         card_render_width_scaled = math.floor(card_width_layout * ppi_ratio) - (2 * extend_corners_page_px_scaled); card_render_height_scaled = math.floor(card_height_layout * ppi_ratio) - (2 * extend_corners_page_px_scaled)
         paste_box_for_card_content = (slot_x_on_page_scaled + extend_corners_page_px_scaled, slot_y_on_page_scaled + extend_corners_page_px_scaled, card_render_width_scaled, card_render_height_scaled)
         final_print_bleed_iterations = math.ceil(print_bleed_layout_units * ppi_ratio) + extend_corners_page_px_scaled
-        draw_card_with_border_cameo(current_card_image, base_image, paste_box_for_card_content, final_print_bleed_iterations, cell_bg_color_pil)
+        drawn_boxes.append(draw_card_with_border_cameo(current_card_image, base_image, paste_box_for_card_content, final_print_bleed_iterations, cell_bg_color_pil))
+    return drawn_boxes
 
 def generate_alignment_pattern(width_px: int, height_px: int, dpi: int, offset: Tuple[float, float] = (0.0, 0.0), slot_num: int = None) -> Image.Image:
     """Generates a pattern of 5 concentric rectangles spaced 1mm apart, with offset text."""
@@ -100,10 +133,8 @@ def generate_alignment_pattern(width_px: int, height_px: int, dpi: int, offset:
     try:
         font_size = round(16 * (dpi / 72.0)) # Scale 16pt to current DPI
         font = None
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        font_path = os.path.join(script_dir, "assets", "DejaVuSans.ttf")
-        if os.path.exists(font_path):
-            font = ImageFont.truetype(font_path, font_size)
+        if os.path.exists(LABEL_FONT_PATH):
+            font = load_label_font(font_size)
         else:
             font = ImageFont.load_default()
             
@@ -128,7 +159,146 @@ def generate_alignment_pattern(width_px: int, height_px: int, dpi: int, offset:
         
     return img
 
-def create_pdf_cameo_style(image_sources: List[ImageSource], output_path_or_buffer: Union[str, io.BytesIO], paper_type_arg: str, target_dpi: int, image_cell_bg_color_str: str, pdf_name_label: Optional[str], label_font_size_base: int, pdf_quality: int, debug: bool = False, orientation: str = "landscape", alignment_sheet: bool = False, global_offset: Tuple[float, float] = (0.0, 0.0), slot_offsets: dict[int, Tuple[float, float]] = None):
+def open_card_image(local_path: str) -> Image.Image:
+    """Opens a card image, only converting to RGBA when it actually has transparency (opaque cards stay RGB)."""
+    img = Image.open(local_path)
+    if 'A' in img.getbands() or 'transparency' in img.info: return img if img.mode == 'RGBA' else img.convert('RGBA')
+    return img if img.mode == 'RGB' else img.convert('RGB')
+
+def _load_card_image(original: str, local_path: Optional[str], target_dpi: int) -> Image.Image:
+    """Opens and fully decodes a card image, or returns an 'Error Loading' placeholder if it can't be read."""
+    try:
+        if local_path: img = open_card_image(local_path); img.load(); return img
+        else: raise Exception("Failed to get local path")
+    except Exception as e:
+        print(f"  Warning: Could not process image '{original}': {e}")
+        placeholder_w = int(TARGET_IMG_WIDTH_INCHES * target_dpi); placeholder_h = int(TARGET_IMG_HEIGHT_INCHES * target_dpi)
+        placeholder = Image.new("RGBA", (placeholder_w, placeholder_h), (255, 192, 203, 255)); draw_placeholder = ImageDraw.Draw(placeholder)
+        try: font_placeholder = ImageFont.load_default(); draw_placeholder.text((5,5), "Error\nLoading", fill="black", font=font_placeholder)
+        except: draw_placeholder.text((5,5), "Error", fill="black")
+        return placeholder
+
+def _fit_card_to_slot(card_image: Image.Image, slot_size: Tuple[int, int]) -> Image.Image:
+    """Rotates a card to the slot's orientation and scales it to the slot, as draw_card_layout_cameo does without crop or corner extension."""
+    if (slot_size[0] > slot_size[1]) != (card_image.width > card_image.height): card_image = card_image.transpose(Image.ROTATE_90)
+    return card_image.resize(slot_size, reducing_gap=3.0)
+
+# Cards printed more than once (basic lands, playtest copies), already scaled to their slot, keyed by
+# ((original, local_path), slot size); only decoded and resized once per process instead of once per copy.
+# Entries are dropped after the last page using them, and the least recently used past CAMEO_CARD_CACHE_SIZE.
+_cameo_card_cache: dict[Tuple[Tuple[str, Optional[str]], Tuple[int, int]], Image.Image] = {}
+CAMEO_CARD_CACHE_SIZE = 16
+
+def _get_local_path_or_none(img_source: ImageSource, debug: bool = False) -> Optional[str]:
+    try: return img_source.get_local_path(debug)
+    except Exception as e: print(f"  Warning: Could not process image '{img_source.original}': {e}"); return None
+
+def render_cameo_page(page_num: int, page_cards: List[Tuple[str, Optional[str]]], master_page_background: Image.Image, paper_layout_config: dict, card_layout_config: dict, ppi_ratio: float, target_dpi: int, print_bleed_layout_units: int, cell_bg_color_pil: Union[str, Tuple[int, int, int], None], pdf_name_label: Optional[str], label_font_size_base: int, alignment_sheet: bool = False, global_offset: Tuple[float, float] = (0.0, 0.0), slot_offsets: dict[int, Tuple[float, float]] = None, debug: bool = False, page_image: Optional[Image.Image] = None, decode_threads: int = 1, repeated_cards: Optional[dict] = None) -> Tuple[Image.Image, List[Tuple[int, int, int, int]]]:
+    """
+    Renders a single Cameo page. page_cards holds an (original, local_path) pair per slot.
+    repeated_cards maps cards printed more than once to the last page they are on; they are kept (scaled to
+    their slot) in _cameo_card_cache for copies on later pages, until that page. Pages must come in order.
+    Draws onto page_image (a clean copy of master_page_background) if given, otherwise onto a new copy.
+    Returns the page and the regions drawn on, so a reused page can be reset to the background cheaply.
+    """
+    if slot_offsets is None: slot_offsets = {}
+    num_rows = len(card_layout_config["y_pos"]); num_cols = len(card_layout_config["x_pos"])
+    card_slot_width_layout = card_layout_config["width"]; card_slot_height_layout = card_layout_config["height"]
+    crop_percentage_on_source = 0.0; extend_corners_on_source_px = 0
+    current_page_pil_image = page_image if page_image is not None else master_page_background.copy()
+    pil_card_images_for_page: List[Image.Image] = []
+    if alignment_sheet:
+        for slot_idx in range(len(page_cards)):
+            # Calculate total offset for this specific slot
+            gdx, gdy = global_offset
+            sdx, sdy = slot_offsets.get(slot_idx, (0.0, 0.0))
+            total_offset = (gdx + sdx, gdy + sdy)
+            
+            print(f"  Slot {slot_idx + 1} Offset: X={total_offset[0]:+.2f}mm, Y={total_offset[1]:+.2f}mm")
+            
+            pil_card_images_for_page.append(generate_alignment_pattern(
+                math.floor(card_slot_width_layout * ppi_ratio),
+                math.floor(card_slot_height_layout * ppi_ratio),
+                target_dpi,
+                offset=total_offset,
+                slot_num=slot_idx + 1
+            ))
+    else:
+        # Each distinct card is decoded and scaled to its slot once, then reused for every copy
+        slot_size = (math.floor(card_slot_width_layout * ppi_ratio), math.floor(card_slot_height_layout * ppi_ratio))
+        pending_cards = [card for card in dict.fromkeys(page_cards) if (card, slot_size) not in _cameo_card_cache]
+        load_card = lambda card: _fit_card_to_slot(_load_card_image(card[0], card[1], target_dpi), slot_size)
+        if decode_threads > 1 and len(pending_cards) > 1:
+            # PNG decoding and resizing release the GIL, so the page's cards are prepared in parallel threads
+            with ThreadPoolExecutor(max_workers=min(decode_threads, len(pending_cards))) as executor: loaded_cards = dict(zip(pending_cards, executor.map(load_card, pending_cards)))
+        else: loaded_cards = {card: load_card(card) for card in pending_cards}
+        pil_card_images_for_page = [loaded_cards[card] if card in loaded_cards else _cameo_card_cache[(card, slot_size)] for card in page_cards]
+        # Cached cards used here move to the back, so the front holds the least recently used
+        for card in dict.fromkeys(page_cards):
+            if card not in loaded_cards: _cameo_card_cache[(card, slot_size)] = _cameo_card_cache.pop((card, slot_size))
+        last_pages = repeated_cards or {}
+        for card, card_image in loaded_cards.items():
+            if last_pages.get(card, 0) <= page_num: continue  # no copies on a later page
+            if len(_cameo_card_cache) >= CAMEO_CARD_CACHE_SIZE: del _cameo_card_cache[next(iter(_cameo_card_cache))]
+            _cameo_card_cache[(card, slot_size)] = card_image
+        for cache_key in [cache_key for cache_key in _cameo_card_cache if last_pages.get(cache_key[0], 0) <= page_num]: del _cameo_card_cache[cache_key]
+    drawn_boxes = draw_card_layout_cameo(card_images=pil_card_images_for_page, base_image=current_page_pil_image, num_rows=num_rows, num_cols=num_cols, x_pos_layout=card_layout_config["x_pos"], y_pos_layout=card_layout_config["y_pos"], card_width_layout=card_slot_width_layout, card_height_layout=card_slot_height_layout, print_bleed_layout_units=print_bleed_layout_units, crop_percentage=crop_percentage_on_source, ppi_ratio=ppi_ratio, extend_corners_src_px=extend_corners_on_source_px, flip=False, cell_bg_color_pil=cell_bg_color_pil, global_offset=global_offset, slot_offsets=slot_offsets)
+    template_name = card_layout_config.get("template", "unknown_template")
+    base_label_part = f"template: {template_name}, sheet: {page_num}"
+    if pdf_name_label: label_text = f"name: {pdf_name_label}, {base_label_part}"
+    else: label_text = base_label_part
+    try:
+        draw_page_text = ImageDraw.Draw(current_page_pil_image)
+        text_x_pos = math.floor((paper_layout_config["width"] - 180) * ppi_ratio); text_y_pos = math.floor((paper_layout_config["height"] - 180) * ppi_ratio)
+        font_size_scaled = math.floor(label_font_size_base * ppi_ratio)
+        page_font = None
+        try: page_font = load_label_font(font_size_scaled)
+        except IOError: print("  Warning: Font 'assets/DejaVuSans.ttf' not found."); print("  Falling back to tiny default font. Please download and place the font for scalable labels.");
+        except Exception: pass
+        if page_font:
+            draw_page_text.text((text_x_pos, text_y_pos), label_text, fill=(0,0,0), anchor="ra", font=page_font)
+            label_box = draw_page_text.textbbox((text_x_pos, text_y_pos), label_text, anchor="ra", font=page_font)
+            drawn_boxes.append((math.floor(label_box[0]), math.floor(label_box[1]), math.ceil(label_box[2]) + 1, math.ceil(label_box[3]) + 1))
+    except Exception as e_font:
+        if debug: print(f"DEBUG CAMEO: Could not draw page label: {e_font}")
+    # Clip to the page, so the regions can be cropped straight out of the background
+    page_w, page_h = current_page_pil_image.size
+    drawn_boxes = [(max(x0, 0), max(y0, 0), min(x1, page_w), min(y1, page_h)) for x0, y0, x1, y1 in drawn_boxes]
+    return current_page_pil_image, drawn_boxes
+
+def encode_cameo_page(page: Image.Image, pdf_quality: int) -> bytes:
+    """JPEG-encodes a rendered page once; the bytes are embedded in the PDF as-is."""
+    # optimize only builds Huffman tables for this page's data: the same pixels in a smaller stream
+    buffer = io.BytesIO(); page.save(buffer, format='JPEG', quality=pdf_quality, optimize=True)
+    return buffer.getvalue()
+
+# Per-process page settings for worker processes, set once by the pool initializer so the
+# (large) master page background isn't pickled again for every page.
+_cameo_page_settings: dict = {}
+_cameo_pdf_quality: int = 75
+# Each worker draws all of its pages onto one reused page, resetting only the regions drawn on
+# (from cached crops of the background) rather than copying the whole background for every page.
+_cameo_working_page: Optional[Image.Image] = None
+_cameo_background_crops: dict[Tuple[int, int, int, int], Image.Image] = {}
+
+def _init_cameo_page_worker(page_settings: dict, pdf_quality: int):
+    global _cameo_page_settings, _cameo_pdf_quality, _cameo_working_page
+    _cameo_page_settings = page_settings; _cameo_pdf_quality = pdf_quality; _cameo_working_page = None; _cameo_background_crops.clear(); _cameo_card_cache.clear()
+
+def _render_cameo_page_task(page_task: Tuple[int, List[Tuple[str, Optional[str]]]]) -> bytes:
+    global _cameo_working_page
+    page_num, page_cards = page_task
+    master_page_background = _cameo_page_settings["master_page_background"]
+    if _cameo_working_page is None: _cameo_working_page = master_page_background.copy()
+    try: page, drawn_boxes = render_cameo_page(page_num, page_cards, page_image=_cameo_working_page, **_cameo_page_settings)
+    except Exception: _cameo_working_page = None; raise  # the page may be partially drawn, start the next one from a fresh copy
+    page_jpeg = encode_cameo_page(page, _cameo_pdf_quality)
+    for box in drawn_boxes:
+        if box not in _cameo_background_crops: _cameo_background_crops[box] = master_page_background.crop(box)
+        page.paste(_cameo_background_crops[box], box[:2])
+    return page_jpeg
+
+def create_pdf_cameo_style(image_sources: List[ImageSource], output_path_or_buffer: Union[str, io.BytesIO], paper_type_arg: str, target_dpi: int, image_cell_bg_color_str: str, pdf_name_label: Optional[str], label_font_size_base: int, pdf_quality: int, debug: bool = False, orientation: str = "landscape", alignment_sheet: bool = False, global_offset: Tuple[float, float] = (0.0, 0.0), slot_offsets: dict[int, Tuple[float, float]] = None, download_workers: int = 16):
     print(f"\n--- Cameo PDF Generation (PIL-based) ---")
     if alignment_sheet: print("  Alignment Sheet Mode Enabled")
     if global_offset != (0.0, 0.0): print(f"  Global Offset: {global_offset[0]}mm, {global_offset[1]}mm")
@@ -139,9 +309,7 @@ def create_pdf_cameo_style(image_sources: List[ImageSource], output_path_or_buff
     default_cell_bg_color = "black"
     if image_cell_bg_color_str.lower() != default_cell_bg_color: print(f"  Image Cell Background Color: {image_cell_bg_color_str}")
     
-    cameo_paper_key = paper_type_arg.lower()
-    if cameo_paper_key == "letter" and orientation == "portrait":
-        cameo_paper_key = CameoPaperSize.LETTER_PORTRAIT
+    cameo_paper_key = resolve_cameo_paper_key(paper_type_arg, orientation)
     
     if cameo_paper_key not in LAYOUTS_DATA["paper_layouts"]:
         print(f"Error: --cameo PDF generation: Paper type '{paper_type_arg}' with orientation '{orientation}' (key: {cameo_paper_key}) is not directly supported by embedded cameo layouts."); return
@@ -153,7 +321,6 @@ def create_pdf_cameo_style(image_sources: List[ImageSource], output_path_or_buff
     layout_base_ppi = 300.0; ppi_ratio = target_dpi / layout_base_ppi
     page_width_px_scaled = math.floor(paper_layout_config["width"] * ppi_ratio); page_height_px_scaled = math.floor(paper_layout_config["height"] * ppi_ratio)
     card_slot_width_layout = card_layout_config["width"]; card_slot_height_layout = card_layout_config["height"]
-    crop_percentage_on_source = 0.0; extend_corners_on_source_px = 0
     max_print_bleed_layout_units = calculate_max_print_bleed_cameo(card_layout_config["x_pos"], card_layout_config["y_pos"], card_slot_width_layout, card_slot_height_layout)
     if debug: print(f"DEBUG CAMEO: Paper Key: {cameo_paper_key}, Card Key: {cameo_card_key}"); print(f"DEBUG CAMEO: Grid: {num_cols}x{num_rows} ({num_cards_per_page} cards/page)")
     script_dir = os.path.dirname(os.path.abspath(__file__)); asset_dir_cameo = os.path.join(script_dir, "assets"); registration_filename = f'{cameo_paper_key}_registration.jpg'; registration_path = os.path.join(asset_dir_cameo, registration_filename)
@@ -167,75 +334,75 @@ def create_pdf_cameo_style(image_sources: List[ImageSource], output_path_or_buff
         except Exception as e_reg: print(f"  Warning: Could not load registration image: {e_reg}")
     if master_page_background is None: master_page_background = Image.new("RGB", (page_width_px_scaled, page_height_px_scaled), "white")
     pil_cell_bg_color: Union[str, Tuple[int,int,int], None] = image_cell_bg_color_str
-    all_pil_pages: List[Image.Image] = []; total_images_to_process = len(image_sources)
+    total_images_to_process = len(image_sources)
+    # Fetch every web image up front and concurrently rather than one at a time inside the page loop
+    if not alignment_sheet: prefetch_images(image_sources, debug, download_workers)
+    # Pages are independent, so they are rendered in worker processes. Workers only get plain
+    # (original, local_path) pairs: an ImageSource copy would delete its temp file when collected.
+    page_tasks: List[Tuple[int, List[Tuple[str, Optional[str]]]]] = []
     for page_start_index in range(0, total_images_to_process, num_cards_per_page):
-        current_page_pil_image = master_page_background.copy()
         image_sources_for_this_page = image_sources[page_start_index : page_start_index + num_cards_per_page]
-        pil_card_images_for_page: List[Image.Image] = []
-        for slot_idx, img_source in enumerate(image_sources_for_this_page):
-            if alignment_sheet:
-                # Calculate total offset for this specific slot
-                gdx, gdy = global_offset
-                sdx, sdy = slot_offsets.get(slot_idx, (0.0, 0.0))
-                total_offset = (gdx + sdx, gdy + sdy)
-                
-                print(f"  Slot {slot_idx + 1} Offset: X={total_offset[0]:+.2f}mm, Y={total_offset[1]:+.2f}mm")
-                
-                pil_card_images_for_page.append(generate_alignment_pattern(
-                    math.floor(card_slot_width_layout * ppi_ratio),
-                    math.floor(card_slot_height_layout * ppi_ratio),
-                    target_dpi,
-                    offset=total_offset,
-                    slot_num=slot_idx + 1
-                ))
-                continue
-            try:
-                local_path = img_source.get_local_path(debug)
-                if local_path: img = Image.open(local_path); img = img.convert('RGBA'); pil_card_images_for_page.append(img)
-                else: raise Exception("Failed to get local path")
-            except Exception as e:
-                print(f"  Warning: Could not process image '{img_source.original}': {e}")
-                placeholder_w = int(TARGET_IMG_WIDTH_INCHES * target_dpi); placeholder_h = int(TARGET_IMG_HEIGHT_INCHES * target_dpi)
-                placeholder = Image.new("RGBA", (placeholder_w, placeholder_h), (255, 192, 203, 255)); draw_placeholder = ImageDraw.Draw(placeholder)
-                try: font_placeholder = ImageFont.load_default(); draw_placeholder.text((5,5), "Error\nLoading", fill="black", font=font_placeholder)
-                except: draw_placeholder.text((5,5), "Error", fill="black")
-                pil_card_images_for_page.append(placeholder)
-        draw_card_layout_cameo(card_images=pil_card_images_for_page, base_image=current_page_pil_image, num_rows=num_rows, num_cols=num_cols, x_pos_layout=card_layout_config["x_pos"], y_pos_layout=card_layout_config["y_pos"], card_width_layout=card_slot_width_layout, card_height_layout=card_slot_height_layout, print_bleed_layout_units=max_print_bleed_layout_units, crop_percentage=crop_percentage_on_source, ppi_ratio=ppi_ratio, extend_corners_src_px=extend_corners_on_source_px, flip=False, cell_bg_color_pil=pil_cell_bg_color, global_offset=global_offset, slot_offsets=slot_offsets)
-        page_num_for_label = (page_start_index // num_cards_per_page) + 1; template_name = card_layout_config.get("template", "unknown_template")
-        base_label_part = f"template: {template_name}, sheet: {page_num_for_label}"
-        if pdf_name_label: label_text = f"name: {pdf_name_label}, {base_label_part}"
-        else: label_text = base_label_part
-        try:
-            draw_page_text = ImageDraw.Draw(current_page_pil_image)
-            text_x_pos = math.floor((paper_layout_config["width"] - 180) * ppi_ratio); text_y_pos = math.floor((paper_layout_config["height"] - 180) * ppi_ratio)
-            font_size_scaled = math.floor(label_font_size_base * ppi_ratio)
-            page_font = None
-            try: script_dir = os.path.dirname(os.path.abspath(__file__)); font_path = os.path.join(script_dir, "assets", "DejaVuSans.ttf"); page_font = ImageFont.truetype(font_path, size=font_size_scaled)
-            except IOError: print("  Warning: Font 'assets/DejaVuSans.ttf' not found."); print("  Falling back to tiny default font. Please download and place the font for scalable labels.");
-            except Exception: pass
-            if page_font: draw_page_text.text((text_x_pos, text_y_pos), label_text, fill=(0,0,0), anchor="ra", font=page_font)
-        except Exception as e_font:
-            if debug: print(f"DEBUG CAMEO: Could not draw page label: {e_font}")
-        all_pil_pages.append(current_page_pil_image)
-    if not all_pil_pages: print("Cameo PDF: No pages generated."); return
+        page_cards = [(img_source.original, None if alignment_sheet else _get_local_path_or_none(img_source, debug)) for img_source in image_sources_for_this_page]
+        page_tasks.append(((page_start_index // num_cards_per_page) + 1, page_cards))
+    card_counts = Counter(card for _, page_cards in page_tasks for card in page_cards)
+    # Pages are numbered in order, so the last page seen for a card is the last one it is on
+    card_last_pages = {card: page_num for page_num, page_cards in page_tasks for card in page_cards if card_counts[card] > 1}
+    page_settings = dict(master_page_background=master_page_background, paper_layout_config=paper_layout_config, card_layout_config=card_layout_config, ppi_ratio=ppi_ratio, target_dpi=target_dpi, print_bleed_layout_units=max_print_bleed_layout_units, cell_bg_color_pil=pil_cell_bg_color, pdf_name_label=pdf_name_label, label_font_size_base=label_font_size_base, alignment_sheet=alignment_sheet, global_offset=global_offset, slot_offsets=slot_offsets or {}, debug=debug, decode_threads=os.cpu_count() or 1, repeated_cards=card_last_pages)
+    if not page_tasks: print("Cameo PDF: No pages generated."); return
+    # Pages come back JPEG-encoded (a fraction of the size of the raw page) and are written into the PDF
+    # as they arrive, so the rendered pages never all have to be held in memory at once.
+    page_size_pt = (page_width_px_scaled * 72.0 / target_dpi, page_height_px_scaled * 72.0 / target_dpi)
+    # Write the JPEG streams as binary rather than ASCII85 text, which is a quarter larger
+    use_a85 = rl_config.useA85; rl_config.useA85 = 0
     try:
-        all_pil_pages[0].save(output_path_or_buffer, format='PDF', save_all=True, append_images=all_pil_pages[1:], resolution=float(target_dpi), quality=pdf_quality)
-        if isinstance(output_path_or_buffer, str): print(f"Cameo PDF generation successful: {output_path_or_buffer} ({len(all_pil_pages)} page(s))")
-        else: print(f"Cameo PDF generation to memory buffer successful ({len(all_pil_pages)} page(s))")
+        c = canvas.Canvas(output_path_or_buffer, pagesize=page_size_pt)
+        if len(page_tasks) > 1:
+            num_workers = min(len(page_tasks), os.cpu_count() or 1)
+            # Cores not taken by a page worker of their own are used to decode that worker's cards
+            page_settings["decode_threads"] = max(1, (os.cpu_count() or 1) // num_workers)
+            if debug: print(f"DEBUG CAMEO: Rendering {len(page_tasks)} pages with {num_workers} worker processes")
+            with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_cameo_page_worker, initargs=(page_settings, pdf_quality)) as executor:
+                for page_jpeg in executor.map(_render_cameo_page_task, page_tasks): _draw_jpeg_page(c, page_jpeg, page_size_pt)
+        else:
+            for page_num, page_cards in page_tasks: _draw_jpeg_page(c, encode_cameo_page(render_cameo_page(page_num, page_cards, **page_settings)[0], pdf_quality), page_size_pt)
+        c.save()
+        if isinstance(output_path_or_buffer, str): print(f"Cameo PDF generation successful: {output_path_or_buffer} ({len(page_tasks)} page(s))")
+        else: print(f"Cameo PDF generation to memory buffer successful ({len(page_tasks)} page(s))")
     except Exception as e: print(f"Error saving Cameo PDF: {e}")
+    finally: rl_config.useA85 = use_a85; _cameo_card_cache.clear()
+
+def _draw_jpeg_page(c: canvas.Canvas, page_jpeg: bytes, page_size_pt: Tuple[float, float]):
+    # ReportLab embeds JPEG data directly (DCTDecode) rather than decoding and re-encoding it
+    c.drawImage(ImageReader(io.BytesIO(page_jpeg)), 0, 0, width=page_size_pt[0], height=page_size_pt[1]); c.showPage()
+
+def prepare_grid_image(local_path: str, target_size: Tuple[int, int]) -> Tuple[Union[str, Image.Image], bool]:
+    """
+    Downscales a card much larger than its cell at the output DPI, so ReportLab embeds (and compresses) only
+    the pixels that get printed. Cards near the cell size (e.g. 745x1040 Scryfall PNGs at 300 DPI) or that
+    can't be opened are drawn from their file as before; resampling those would only soften them.
+    Also returns whether the card is opaque (no alpha or transparency key), i.e. fully covers its cell.
+    """
+    try:
+        img = open_card_image(local_path); opaque = img.mode == 'RGB'
+        if img.width <= target_size[0] * 1.25 and img.height <= target_size[1] * 1.25: return local_path, opaque
+        return img.resize(target_size, Image.LANCZOS, reducing_gap=3.0), opaque
+    except Exception: return local_path, False
 
 def create_pdf_grid(image_sources: List[ImageSource], output_path_or_buffer: Union[str, io.BytesIO], **kwargs):
     if isinstance(output_path_or_buffer, str): print(f"\n--- PDF Generation Settings (ReportLab: {output_path_or_buffer}) ---")
     else: print(f"\n--- PDF Generation Settings (ReportLab to memory buffer) ---")
     paper_type_str = kwargs.get("paper_type_str")
     if not image_sources: print("No images for PDF."); return
+    # Fetch web sources concurrently up front so the loop below only hits the local cache
+    prefetch_images(image_sources, kwargs.get("debug", False), kwargs.get("download_workers", 16))
     local_paths = []
     for img_source in image_sources:
         local_path = img_source.get_local_path(kwargs.get("debug", False))
         if local_path: local_paths.append(local_path)
         else: print(f"Warning: Could not get image from {img_source.original}"); local_paths.append(None)
+    # A PDF of nothing but empty cells isn't worth writing (or uploading)
+    if not any(local_paths): print("No images for PDF could be loaded."); return
     paper_width_pt, paper_height_pt = PAPER_SIZES_PT[paper_type_str]
-    c = canvas.Canvas(output_path_or_buffer, pagesize=(paper_width_pt, paper_height_pt))
     dpi = kwargs.get("dpi", 300); page_margin_str = kwargs.get("page_margin_str", "5mm"); image_spacing_pixels = kwargs.get("image_spacing_pixels", 0)
     page_bg_color_str = kwargs.get("page_background_color_str", "white"); image_cell_bg_color_str = kwargs.get("image_cell_background_color_str", "black")
     cut_lines = kwargs.get("cut_lines", False); cut_line_length_str = kwargs.get("cut_line_length_str", "3mm"); cut_line_color_str = kwargs.get("cut_line_color_str", "gray"); cut_line_width_pt = kwargs.get("cut_line_width_pt", 0.25)
@@ -251,24 +418,48 @@ def create_pdf_grid(image_sources: List[ImageSource], output_path_or_buffer: Uni
     start_x_pt = page_margin_pt + (available_width_pt - total_card_width_pt) / 2; start_y_pt = paper_height_pt - page_margin_pt - (available_height_pt - total_card_height_pt) / 2 - target_img_height_pt
     if total_card_width_pt > available_width_pt or total_card_height_pt > available_height_pt: print("  Warning: Cards + spacing might exceed available page area.")
     images_per_page = grid_cols * grid_rows; total_images = len(local_paths); num_pages = (total_images + images_per_page - 1) // images_per_page
+    # Each distinct file is prepared once; repeated copies of a card reuse the same image (and PDF XObject)
+    target_img_size_px = (round(TARGET_IMG_WIDTH_INCHES * dpi), round(TARGET_IMG_HEIGHT_INCHES * dpi))
+    unique_paths = [path for path in dict.fromkeys(local_paths) if path]
+    # Decoding and resizing release the GIL, so threads spread them over the cores without the start-up cost of
+    # worker processes (most cards only need their header read) or pickling every downscaled image back
+    num_workers = min(len(unique_paths), os.cpu_count() or 1)
+    if num_workers > 1:
+        with ThreadPoolExecutor(max_workers=num_workers) as executor: prepared_images = list(executor.map(prepare_grid_image, unique_paths, [target_img_size_px] * len(unique_paths)))
+    else: prepared_images = [prepare_grid_image(path, target_img_size_px) for path in unique_paths]
+    grid_images = {path: (prepared if isinstance(prepared, str) else ImageReader(prepared), opaque) for path, (prepared, opaque) in zip(unique_paths, prepared_images)}
     page_bg_color_rl = getattr(reportlab_colors, page_bg_color_str.lower(), reportlab_colors.white); cell_bg_color_rl = getattr(reportlab_colors, image_cell_bg_color_str.lower(), reportlab_colors.black); cut_line_color_rl = getattr(reportlab_colors, cut_line_color_str.lower(), reportlab_colors.gray)
     try: cut_line_len_px = parse_dimension_to_pixels(cut_line_length_str, dpi, default_unit_is_mm=True); cut_line_len_pt = cut_line_len_px * (inch / dpi)
     except ValueError as e: print(f"Error parsing cut line length '{cut_line_length_str}': {e}. Using 0px."); cut_line_len_pt = 0
-    for page_num in range(num_pages):
-        c.setFillColor(page_bg_color_rl); c.rect(0, 0, paper_width_pt, paper_height_pt, fill=1, stroke=0)
-        for i in range(images_per_page):
-            img_idx = page_num * images_per_page + i
-            if img_idx >= total_images: break
-            row = i // grid_cols; col = i % grid_cols
-            x = start_x_pt + col * (target_img_width_pt + img_spacing_pt); y = start_y_pt - row * (target_img_height_pt + img_spacing_pt)
-            c.setFillColor(cell_bg_color_rl); c.rect(x, y, target_img_width_pt, target_img_height_pt, fill=1, stroke=0)
-            if local_paths[img_idx]:
-                try: c.drawImage(local_paths[img_idx], x, y, width=target_img_width_pt, height=target_img_height_pt, mask='auto')
-                except Exception as e: print(f"  Warning: Could not draw image {img_idx} on page {page_num+1}: {e}"); c.setFillColorRGB(1, 0, 0); c.rect(x, y, target_img_width_pt, target_img_height_pt, fill=1, stroke=0); c.setFillColorRGB(0,0,0); c.drawCentredString(x + target_img_width_pt/2, y + target_img_height_pt/2, "Error")
-            if cut_lines and cut_line_len_pt > 0:
-                c.setStrokeColor(cut_line_color_rl); c.setLineWidth(cut_line_width_pt)
-                c.line(x, y + target_img_height_pt, x - cut_line_len_pt, y + target_img_height_pt); c.line(x + target_img_width_pt, y + target_img_height_pt, x + target_img_width_pt + cut_line_len_pt, y + target_img_height_pt); c.line(x, y, x - cut_line_len_pt, y); c.line(x + target_img_width_pt, y, x + target_img_width_pt + cut_line_len_pt, y); c.line(x, y + target_img_height_pt, x, y + target_img_height_pt + cut_line_len_pt); c.line(x, y, x, y - cut_line_len_pt); c.line(x + target_img_width_pt, y + target_img_height_pt, x + target_img_width_pt, y + target_img_height_pt + cut_line_len_pt); c.line(x + target_img_width_pt, y, x + target_img_width_pt, y - cut_line_len_pt)
-        c.showPage()
-    c.save()
+    # Cell origins and cut-line segments are the same on every page, so compute them once
+    cell_positions = [(start_x_pt + (i % grid_cols) * (target_img_width_pt + img_spacing_pt), start_y_pt - (i // grid_cols) * (target_img_height_pt + img_spacing_pt)) for i in range(images_per_page)]
+    draw_cut_lines = cut_lines and cut_line_len_pt > 0; cut_line_segments = []
+    if draw_cut_lines:
+        for x, y in cell_positions:
+            top = y + target_img_height_pt; right = x + target_img_width_pt
+            cut_line_segments.append(((x, top, x - cut_line_len_pt, top), (right, top, right + cut_line_len_pt, top), (x, y, x - cut_line_len_pt, y), (right, y, right + cut_line_len_pt, y), (x, top, x, top + cut_line_len_pt), (x, y, x, y - cut_line_len_pt), (right, top, right, top + cut_line_len_pt), (right, y, right, y - cut_line_len_pt)))
+    # Embed the card images as binary Flate streams; ASCII85 text is a quarter larger and slow to encode in pure Python
+    use_a85 = rl_config.useA85; rl_config.useA85 = 0
+    try:
+        c = canvas.Canvas(output_path_or_buffer, pagesize=(paper_width_pt, paper_height_pt))
+        for page_num in range(num_pages):
+            # Pages are already white, so only paint a non-default background
+            if page_bg_color_rl != reportlab_colors.white: c.setFillColor(page_bg_color_rl); c.rect(0, 0, paper_width_pt, paper_height_pt, fill=1, stroke=0)
+            # Graphics state only changes per page (or after an error cell), not per card
+            c.setFillColor(cell_bg_color_rl)
+            if draw_cut_lines: c.setStrokeColor(cut_line_color_rl); c.setLineWidth(cut_line_width_pt)
+            for i in range(min(images_per_page, total_images - page_num * images_per_page)):
+                img_idx = page_num * images_per_page + i; x, y = cell_positions[i]
+                grid_image, opaque = grid_images[local_paths[img_idx]] if local_paths[img_idx] else (None, False)
+                # An opaque card covers its whole cell, so its background would never be seen
+                if not opaque: c.rect(x, y, target_img_width_pt, target_img_height_pt, fill=1, stroke=0)
+                if grid_image:
+                    try: c.drawImage(grid_image, x, y, width=target_img_width_pt, height=target_img_height_pt, mask='auto')
+                    except Exception as e: print(f"  Warning: Could not draw image {img_idx} on page {page_num+1}: {e}"); c.setFillColorRGB(1, 0, 0); c.rect(x, y, target_img_width_pt, target_img_height_pt, fill=1, stroke=0); c.setFillColorRGB(0,0,0); c.drawCentredString(x + target_img_width_pt/2, y + target_img_height_pt/2, "Error"); c.setFillColor(cell_bg_color_rl)
+                # One path stroked once per card; kept per card so later cells still paint over lines reaching into them, as before
+                if draw_cut_lines: c.lines(cut_line_segments[i])
+            c.showPage()
+        c.save()
+    finally: rl_config.useA85 = use_a85
     if isinstance(output_path_or_buffer, str): print(f"ReportLab PDF generation complete: {output_path_or_buffer} ({num_pages} page(s))")
     else: print(f"ReportLab PDF generation to memory buffer complete ({num_pages} page(s))")
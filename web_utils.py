@@ -2,21 +2,44 @@
 Web utilities for MtgPng2Pdf.
 """
 
+import atexit
+import email.utils
+import hashlib
+import json
 import os
 import re
+import shutil
 import tempfile
-import urllib.request
+import time
 import urllib.parse
-import urllib.error
 import xml.etree.ElementTree as ET
-from typing import List, Dict, Optional, Set
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Set, Tuple
 from urllib.parse import urljoin
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Global temp file tracking for cleanup
 _temp_files: Set[str] = set()
 
+# Shared session so every listing, download and upload reuses pooled keep-alive connections
+# instead of paying a new TCP (and TLS) handshake per request. Sized for concurrent prefetching.
+# Dropped or refused connections are retried with a short backoff rather than failing the card outright.
+_session = requests.Session()
+_session_pool_maxsize = 0
+
+def ensure_connection_pool_size(max_connections: int):
+    """Grow the shared session's per-host pool so max_connections concurrent requests all keep their connection alive."""
+    global _session_pool_maxsize
+    if max_connections <= _session_pool_maxsize: return
+    _session_pool_maxsize = max_connections
+    for prefix in ('http://', 'https://'):
+        _session.mount(prefix, HTTPAdapter(pool_connections=8, pool_maxsize=max_connections, max_retries=Retry(total=3, backoff_factor=0.2)))
+
+ensure_connection_pool_size(32)
+
 def check_server_file_exists(url: str, debug: bool = False) -> bool:
     """Check if a file already exists at a given URL using a HEAD request."""
     if not url:
@@ -24,7 +47,7 @@ def check_server_file_exists(url: str, debug: bool = False) -> bool:
     if debug:
         print(f"DEBUG: Checking for file existence at: {url}")
     try:
-        r = requests.head(url, timeout=15, allow_redirects=True)
+        r = _session.head(url, timeout=15, allow_redirects=True)
         if r.status_code == 200:
             if debug: print(f"DEBUG: File exists (200 OK) at {url}")
             return True
@@ -49,7 +72,7 @@ def upload_file_to_server(url: str, file_bytes: bytes, mime_type: str, debug: bo
     print(f"Uploading to: {url}")
     headers = {'Content-Type': mime_type}
     try:
-        r = requests.put(url, data=file_bytes, headers=headers, timeout=60)
+        r = _session.put(url, data=file_bytes, headers=headers, timeout=60)
         r.raise_for_status()  # Raises an exception for 4xx/5xx status codes
         if 200 <= r.status_code < 300:
             print(f"Successfully uploaded. URL: {url}")
@@ -62,56 +85,117 @@ def upload_file_to_server(url: str, file_bytes: bytes, mime_type: str, debug: bo
         print(f"Error: Upload failed due to a network error: {e}")
         return False
 
-def list_webdav_directory(base_url: str, path: str = "/", debug: bool = False) -> List[Dict[str, str]]:
+# Directory listings already fetched in this run, keyed by (directory URL, recursive)
+_directory_listing_cache: Dict[Tuple[str, bool], List[Dict[str, str]]] = {}
+
+def _join_href(directory_url: str, server_root: str, href: str) -> str:
     """
-    List files in a directory using WebDAV PROPFIND, with a fallback to simple HTTP listing.
-    Returns a list of dicts with 'name' and 'href' (as a full URL) keys.
+    urljoin(directory_url, href) for a directory URL ending in '/'. The plain absolute-path and relative
+    hrefs that listings are made of are joined by concatenation instead of a full URL parse each.
     """
-    url = urljoin(base_url, path)
-    if not url.endswith('/'): url += '/'
-    if debug: print(f"DEBUG: Listing directory: {url}")
-    
-    # Build PROPFIND request body
-    propfind_body = '''<?xml version="1.0" encoding="utf-8"?><D:propfind xmlns:D="DAV:"><D:prop><D:displayname/><D:resourcetype/></D:prop></D:propfind>'''
-    
-    req = urllib.request.Request(url, data=propfind_body.encode('utf-8'), headers={'Content-Type': 'application/xml; charset=utf-8', 'Depth': '1'}, method='PROPFIND')
-    
-    try:
-        with urllib.request.urlopen(req) as response: content = response.read().decode('utf-8')
-        
-        # Parse XML response
-        root = ET.fromstring(content); files = []; ns = {'d': 'DAV:'}
+    if ':' in href or '/.' in href or '//' in href or href.startswith(('.', '?', '#')): return urljoin(directory_url, href)
+    return (server_root if href.startswith('/') else directory_url) + href
+
+def _server_root(url: str) -> str:
+    """'scheme://host[:port]' part of a URL."""
+    parts = urllib.parse.urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+def _propfind_directory(url: str, depth: str) -> Tuple[requests.Response, List[Dict[str, str]], List[str], Dict[str, str]]:
+    """
+    Issue a PROPFIND with the given Depth on a directory URL.
+    Returns (response, PNG files, subdirectory URLs, the directory's own ETag / Last-Modified validators);
+    the lists and validators are empty unless the request succeeded.
+    """
+    # Build PROPFIND request body; the directory's validators come along, so caching its listing costs no extra request
+    propfind_body = '''<?xml version="1.0" encoding="utf-8"?><D:propfind xmlns:D="DAV:"><D:prop><D:displayname/><D:resourcetype/><D:getetag/><D:getlastmodified/></D:prop></D:propfind>'''
+    response = _session.request('PROPFIND', url, data=propfind_body.encode('utf-8'), headers={'Content-Type': 'application/xml; charset=utf-8', 'Depth': depth}, timeout=60, stream=True)
+    files = []; subdirs = []; validators = {}; ns = {'d': 'DAV:'}
+    with response:
+        if not response.ok: return response, files, subdirs, validators
+        server_root = _server_root(url); own_path = urllib.parse.unquote(urllib.parse.urlparse(url).path).rstrip('/')
         
-        for response_elem in root.findall('.//d:response', ns):
+        # Parse the XML response as it streams in, one <d:response> at a time, instead of building
+        # the whole tree first (a recursive listing of a large art folder can be many MB)
+        response.raw.decode_content = True
+        for _, response_elem in ET.iterparse(response.raw, events=('end',)):
+            if response_elem.tag != '{DAV:}response': continue
             href_elem = response_elem.find('d:href', ns)
             displayname_elem = response_elem.find('.//d:displayname', ns)
             resourcetype_elem = response_elem.find('.//d:resourcetype', ns)
             
             if href_elem is not None:
                 relative_href = href_elem.text
-                # Skip directories (they have a <collection/> element)
-                if resourcetype_elem is not None and resourcetype_elem.find('d:collection', ns) is not None: continue
-                
-                # Get filename
-                if displayname_elem is not None and displayname_elem.text: filename = displayname_elem.text
-                else: filename = os.path.basename(urllib.parse.unquote(relative_href.rstrip('/')))
-                
-                if filename and filename.lower().endswith('.png'):
-                    # Construct the full URL for the file
-                    # Using 'url' instead of 'base_url' ensures that if relative_href 
-                    # is just a filename, it's joined correctly to the path.
-                    full_url = urljoin(url, relative_href)
-                    files.append({'name': filename, 'href': full_url})
+                # Using 'url' instead of 'base_url' ensures that if relative_href 
+                # is just a filename, it's joined correctly to the path.
+                full_url = _join_href(url, server_root, relative_href)
+                # Directories (they have a <collection/> element) are only remembered, apart from the listed directory itself
+                if resourcetype_elem is not None and resourcetype_elem.find('d:collection', ns) is not None:
+                    if urllib.parse.unquote(urllib.parse.urlparse(full_url).path).rstrip('/') != own_path: subdirs.append(full_url)
+                    else:
+                        etag_elem = response_elem.find('.//d:getetag', ns); last_modified_elem = response_elem.find('.//d:getlastmodified', ns)
+                        validators = {key: elem.text.strip() for key, elem in (('etag', etag_elem), ('last_modified', last_modified_elem)) if elem is not None and elem.text and elem.text.strip()}
+                else:
+                    # Get filename
+                    if displayname_elem is not None and displayname_elem.text: filename = displayname_elem.text
+                    else: filename = urllib.parse.unquote(relative_href.rstrip('/')).rsplit('/', 1)[-1]
+                    
+                    if filename and filename.lower().endswith('.png'): files.append({'name': filename, 'href': full_url})
+            response_elem.clear()
+    
+    return response, files, subdirs, validators
+
+def list_webdav_directory(base_url: str, path: str = "/", debug: bool = False, recursive: bool = False) -> List[Dict[str, str]]:
+    """
+    List files in a directory using WebDAV PROPFIND, with a fallback to simple HTTP listing.
+    With recursive=True, subdirectories are listed too using a single 'Depth: infinity' request,
+    falling back to 'Depth: 1' requests (one per directory, each level in parallel) if the server refuses it.
+    Listings are cached for the rest of the run, and non-recursive ones on disk while the directory is unchanged.
+    Returns a list of dicts with 'name' and 'href' (as a full URL) keys.
+    """
+    url = urljoin(base_url, path)
+    if not url.endswith('/'): url += '/'
+    cache_key = (url, recursive)
+    if cache_key in _directory_listing_cache:
+        if debug: print(f"DEBUG: Using cached listing for directory: {url}")
+        return list(_directory_listing_cache[cache_key])
+    if debug: print(f"DEBUG: Listing directory{' recursively' if recursive else ''}: {url}")
+    
+    try:
+        # A directory's ETag / Last-Modified don't change with its subdirectories' contents,
+        # so only non-recursive listings are reused from disk across runs
+        cached_files = _revalidate_listing(url) if not recursive else None
+        if cached_files is not None:
+            if debug: print(f"DEBUG: Directory not modified, using {len(cached_files)} files from the listing cache")
+            _directory_listing_cache[cache_key] = cached_files
+            return list(cached_files)
+        response, files, subdirs, validators = _propfind_directory(url, 'infinity' if recursive else '1')
+        # If PROPFIND is not allowed, fall back to simple HTTP listing
+        if response.status_code == 405: return list_http_directory(url, debug)
+        if response.status_code == 403 and recursive:
+            # Many servers disable 'Depth: infinity'; walk the tree one level at a time instead
+            if debug: print("DEBUG: 'Depth: infinity' refused, listing subdirectories one at a time")
+            response, files, subdirs, _ = _propfind_directory(url, '1')
+            pending = list(subdirs); visited = {url}
+            # Each level's subdirectories (e.g. one folder per set) are listed concurrently over the pooled session
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                while response.ok and pending:
+                    level = [subdir_url for subdir_url in dict.fromkeys(pending) if subdir_url not in visited]; visited.update(level); pending = []
+                    for subdir_url, (sub_response, sub_files, sub_subdirs, _) in zip(level, executor.map(lambda subdir_url: _propfind_directory(subdir_url, '1'), level)):
+                        if not sub_response.ok: print(f"Warning: Could not list subdirectory {subdir_url}: HTTP {sub_response.status_code} - {sub_response.reason}"); continue
+                        files.extend(sub_files); pending.extend(sub_subdirs)
+        if not response.ok: print(f"Error listing directory: HTTP {response.status_code} - {response.reason}"); return []
         
         if debug: print(f"DEBUG: Found {len(files)} PNG files in directory")
-        return files
+        _directory_listing_cache[cache_key] = files
+        if validators and not recursive: _store_listing(url, files, validators, debug)
+        return list(files)
         
-    except urllib.error.HTTPError as e:
-        # If PROPFIND is not allowed, fall back to simple HTTP listing
-        if e.code == 405: return list_http_directory(url, debug)
-        else: print(f"Error listing directory: HTTP {e.code} - {e.reason}"); return []
     except Exception as e: print(f"Error listing directory: {e}"); return []
 
+# Simple regex to find links to PNG files in an HTML directory listing
+PNG_HREF_RE = re.compile(r'href="([^"]+\.png)"', re.IGNORECASE)
+
 def list_http_directory(url: str, debug: bool = False) -> List[Dict[str, str]]:
     """
     Fallback method to list files from a simple HTTP directory listing.
@@ -120,44 +204,185 @@ def list_http_directory(url: str, debug: bool = False) -> List[Dict[str, str]]:
     if not url.endswith('/'): url += '/'
     if debug: print(f"DEBUG: Attempting HTTP directory listing: {url}")
     try:
-        with urllib.request.urlopen(url) as response: content = response.read().decode('utf-8')
+        response = _session.get(url, timeout=60); response.raise_for_status(); content = response.content.decode('utf-8')
         
-        # Simple regex to find links to PNG files
-        png_pattern = r'href="([^"]+\.png)"'; matches = re.findall(png_pattern, content, re.IGNORECASE)
+        matches = PNG_HREF_RE.findall(content)
         
         files = []
+        server_root = _server_root(url)
         for match in matches:
-            filename = os.path.basename(urllib.parse.unquote(match))
-            full_url = urljoin(url, match)
+            filename = urllib.parse.unquote(match).rsplit('/', 1)[-1]
+            full_url = _join_href(url, server_root, match)
             files.append({'name': filename, 'href': full_url})
         
         if debug: print(f"DEBUG: Found {len(files)} PNG files in HTTP directory listing")
         return files
     except Exception as e: print(f"Error listing HTTP directory: {e}"); return []
 
+# On-disk cache of downloaded images, revalidated against the server with ETag / Last-Modified once the
+# freshness lifetime the server gave (Cache-Control max-age or Expires, if any) has run out.
+# Non-recursive directory listings are kept here too, revalidated with a conditional HEAD.
+# Override the location with MTGPNG2PDF_CACHE_DIR, or set it to an empty string to disable caching.
+IMAGE_CACHE_DIR = os.environ.get("MTGPNG2PDF_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "mtgpng2pdf"))
+
+def _listing_cache_path(url: str) -> str:
+    """Returns the path of a directory's cached listing in the image cache."""
+    return os.path.join(IMAGE_CACHE_DIR, f"propfind-{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json")
+
+def _revalidate_listing(url: str) -> Optional[List[Dict[str, str]]]:
+    """
+    Asks the server with a conditional HEAD whether a directory changed since its listing was cached on disk.
+    Returns the cached files if it is unchanged, else None. Nothing is sent when there is no cached listing.
+    """
+    if not IMAGE_CACHE_DIR: return None
+    try:
+        with open(_listing_cache_path(url), 'r', encoding='utf-8') as f: cached = json.load(f)
+    except (OSError, ValueError): return None
+    if cached.get('url') != url or not (cached.get('etag') or cached.get('last_modified')): return None
+    headers = {}
+    if cached.get('etag'): headers['If-None-Match'] = cached['etag']
+    if cached.get('last_modified'): headers['If-Modified-Since'] = cached['last_modified']
+    try: response = _session.head(url, headers=headers, timeout=30)
+    except requests.RequestException: return None
+    # Some servers ignore conditional headers on directories, so an unchanged ETag counts as not modified too
+    etag = response.headers.get('ETag') if response.ok else None
+    if response.status_code == 304 or (etag and etag == cached.get('etag')): return cached['files']
+    return None
+
+def _store_listing(url: str, files: List[Dict[str, str]], validators: Dict[str, str], debug: bool = False):
+    """Writes a directory listing to the image cache; written to a temp name and renamed, so readers never see a partial entry."""
+    try:
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=IMAGE_CACHE_DIR)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f: json.dump({'url': url, **validators, 'files': files}, f)
+        os.replace(tmp_path, _listing_cache_path(url))
+    except OSError as e:
+        if debug: print(f"DEBUG: Could not cache listing of {url}: {e}")
+
+def _image_cache_paths(url: str) -> Tuple[str, str]:
+    """Returns the (image, metadata) paths for a URL in the image cache."""
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return os.path.join(IMAGE_CACHE_DIR, f"{key}.png"), os.path.join(IMAGE_CACHE_DIR, f"{key}.meta")
+
+def _load_image_cache_meta(url: str) -> Dict[str, str]:
+    """Returns the cached validators for a URL, or an empty dict if it isn't (validly) cached."""
+    if not IMAGE_CACHE_DIR: return {}
+    cache_path, meta_path = _image_cache_paths(url)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f: meta = json.load(f)
+        if meta.get('url') == url and os.path.getsize(cache_path) == meta.get('length'): return meta
+    except (OSError, ValueError): pass
+    return {}
+
+def _fresh_until(headers) -> Optional[float]:
+    """Returns the time until which a response may be reused without asking the server again, or None."""
+    cache_control = headers.get('Cache-Control', '').lower()
+    if 'no-cache' in cache_control or 'no-store' in cache_control: return None
+    for directive in cache_control.split(','):
+        name, _, value = directive.strip().partition('=')
+        if name == 'max-age' and value.isdigit(): return time.time() + int(value)
+    try: return email.utils.parsedate_to_datetime(headers['Expires']).timestamp()
+    except (KeyError, TypeError, ValueError): return None
+
+def _write_image_cache_meta(url: str, cache_path: str, headers, previous_meta: Optional[Dict] = None):
+    """Records the validators for a cached image; written to a temp name and renamed, so readers never see a partial entry."""
+    previous_meta = previous_meta or {}
+    meta = {'url': url, 'etag': headers.get('ETag') or previous_meta.get('etag'), 'last_modified': headers.get('Last-Modified') or previous_meta.get('last_modified'), 'length': os.path.getsize(cache_path), 'fresh_until': _fresh_until(headers)}
+    fd, tmp_meta_path = tempfile.mkstemp(dir=IMAGE_CACHE_DIR)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f: json.dump(meta, f)
+    os.replace(tmp_meta_path, _image_cache_paths(url)[1])
+
+def _store_in_image_cache(url: str, src_path: str, response: requests.Response, debug: bool = False):
+    """Copies a freshly downloaded image into the cache if the server sent validators for it."""
+    etag = response.headers.get('ETag'); last_modified = response.headers.get('Last-Modified')
+    if not IMAGE_CACHE_DIR or not (etag or last_modified): return
+    cache_path = _image_cache_paths(url)[0]
+    try:
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        # Write to temp names and rename, so a concurrent or interrupted run never sees a partial entry
+        fd, tmp_cache_path = tempfile.mkstemp(dir=IMAGE_CACHE_DIR); os.close(fd)
+        shutil.copyfile(src_path, tmp_cache_path); os.replace(tmp_cache_path, cache_path)
+        _write_image_cache_meta(url, cache_path, response.headers)
+    except OSError as e:
+        if debug: print(f"DEBUG: Could not cache image from {url}: {e}")
+
+def _new_download_path(response: requests.Response) -> Tuple[str, bool]:
+    """
+    Returns (path, in_cache) for a new temp file to download into: inside the image cache if the response
+    can be cached (so it is renamed into place instead of copied there), otherwise in the system temp dir.
+    """
+    if IMAGE_CACHE_DIR and (response.headers.get('ETag') or response.headers.get('Last-Modified')):
+        try:
+            os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+            fd, path = tempfile.mkstemp(suffix='.png', dir=IMAGE_CACHE_DIR); os.close(fd); return path, True
+        except OSError: pass
+    fd, path = tempfile.mkstemp(suffix='.png'); os.close(fd); return path, False
+
+def _use_cached_image(url: str, dest_path: Optional[str]) -> str:
+    """Returns the cached image for a URL, read in place unless it is to be copied to dest_path."""
+    cache_path = _image_cache_paths(url)[0]
+    if dest_path is None: return cache_path
+    shutil.copyfile(cache_path, dest_path); return dest_path
+
 def download_image(url: str, dest_path: Optional[str] = None, debug: bool = False) -> Optional[str]:
     """
-    Download an image from URL. If dest_path is None, saves to a temp file.
+    Download an image from URL. If dest_path is None, the image is read in place from the image cache
+    when it can be cached, or saved to a temp file otherwise.
     Returns the path to the downloaded file, or None on error.
     """
     if debug: print(f"DEBUG: Downloading image from {url}")
+    download_path = None
     try:
-        # Create temp file if no destination specified
-        if dest_path is None:
-            fd, dest_path = tempfile.mkstemp(suffix='.png'); os.close(fd)
-            _temp_files.add(dest_path)
-        
-        # Download the file
-        urllib.request.urlretrieve(url, dest_path)
+        # Use a cached copy the server said is still fresh without asking it again
+        cache_meta = _load_image_cache_meta(url)
+        if cache_meta and (cache_meta.get('fresh_until') or 0) > time.time():
+            if debug: print(f"DEBUG: Using fresh cached copy for {url}")
+            return _use_cached_image(url, dest_path)
+        # Otherwise revalidate the cached copy instead of downloading it again, if we have one
+        headers = {}
+        if cache_meta.get('etag'): headers['If-None-Match'] = cache_meta['etag']
+        if cache_meta.get('last_modified'): headers['If-Modified-Since'] = cache_meta['last_modified']
+
+        # Download the file over the pooled session, streaming it to disk in chunks
+        with _session.get(url, stream=True, headers=headers, timeout=60) as response:
+            if response.status_code == 304 and cache_meta:
+                if debug: print(f"DEBUG: Not modified, using cached copy for {url}")
+                # A 304 carries a new freshness lifetime for the entry
+                try: _write_image_cache_meta(url, _image_cache_paths(url)[0], response.headers, cache_meta)
+                except OSError: pass
+                return _use_cached_image(url, dest_path)
+            response.raise_for_status()
+            if dest_path is None: download_path, in_cache = _new_download_path(response)
+            else: download_path, in_cache = dest_path, False
+            _temp_files.add(download_path)
+            with open(download_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024): f.write(chunk)
+            if in_cache:
+                cache_path = _image_cache_paths(url)[0]
+                os.replace(download_path, cache_path); _temp_files.discard(download_path); download_path = cache_path
+                try: _write_image_cache_meta(url, cache_path, response.headers)
+                except OSError as e:
+                    if debug: print(f"DEBUG: Could not cache image from {url}: {e}")
+            else:
+                if dest_path is not None: _temp_files.discard(download_path)
+                _store_in_image_cache(url, download_path, response, debug)
         
-        if debug: print(f"DEBUG: Downloaded to {dest_path}")
-        return dest_path
+        if debug: print(f"DEBUG: Downloaded to {download_path}")
+        return download_path
     except Exception as e:
         print(f"Error downloading image from {url}: {e}")
-        if dest_path and os.path.exists(dest_path):
-            os.remove(dest_path); _temp_files.discard(dest_path)
+        if download_path and download_path in _temp_files:
+            if os.path.exists(download_path): os.remove(download_path)
+            _temp_files.discard(download_path)
         return None
 
+def remove_temp_file(path: str):
+    """Deletes a file returned by download_image if it is a temp file; images read from the cache are left in place."""
+    if path not in _temp_files: return
+    try: os.remove(path)
+    except OSError: pass
+    _temp_files.discard(path)
+
 def cleanup_temp_files():
     global _temp_files
     for temp_file in _temp_files:
@@ -165,3 +390,8 @@ def cleanup_temp_files():
             try: os.remove(temp_file)
             except: pass
     _temp_files.clear()
+    # All downloads are done by now, so release the pooled keep-alive connections
+    _session.close()
+
+# Sweep whatever is left in one pass at exit, even if main() never reached its cleanup
+atexit.register(cleanup_temp_files)